@@ -1,7 +1,11 @@
 # advisor/admin.py
 from django.contrib import admin
-from .models import Profile
+from .models import Budget, Profile
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ("user", "extra_emails")
+
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    list_display = ("user", "service", "period", "amount", "spent", "alert_level", "period_start")
@@ -2,21 +2,24 @@
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
+
+from advisor import retention
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 def detect_hourly_anomalies():
-    path = BASE_DIR / "advisor" / "billing_hourly.csv"
-    if not path.exists():
-        return []
-
-    df = pd.read_csv(path)
+    df = retention.read_raw_hourly()
     if df.empty:
         return []
 
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    df["timestamp"] = pd.to_datetime(df["timestamp"], format=retention.TIMESTAMP_FORMAT, errors="coerce")
     df["hour"] = df["timestamp"].dt.hour
 
-    base = df.groupby(["service","hour"], as_index=False)["cost"].mean().rename(columns={"cost":"baseline"})
+    # baseline = mean per (service, hour) over the raw rows and the compacted history
+    raw = df.dropna(subset=["cost"]).groupby(["service","hour"])["cost"].agg(["size","sum"]).rename(columns={"size":"count"})
+    tier = retention.load_profile_tier().groupby(level=["service","hour"])[["count","sum"]].sum()
+    base = pd.concat([raw, tier]).groupby(level=[0, 1]).sum()
+    base = (base["sum"] / base["count"]).rename("baseline").rename_axis(["service","hour"]).reset_index()
     df = df.merge(base, on=["service","hour"], how="left")
     df["baseline"] = df["baseline"].fillna(df["cost"].mean() or 1.0)
     df["deviation"] = (df["cost"] - df["baseline"]) / df["baseline"].replace({0:1})
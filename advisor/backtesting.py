@@ -0,0 +1,211 @@
+# advisor/backtesting.py
+"""
+Rolling-origin backtests for the cost forecasts.
+
+Each fold trains a model on everything before an origin and scores the next
+`max(horizons)` points. Folds run in parallel across cores and are cached on disk
+by a hash of the data they saw, so re-running after new data only fits new folds.
+The latest report is saved to advisor/.backtest/latest.json for the dashboard.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from advisor.forecast_model import fit_prophet, load_daily_series
+from advisor.retention import TIMESTAMP_FORMAT, read_raw_hourly
+from advisor.storage import atomic_write_text
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+BACKTEST_DIR = BASE_DIR / "advisor" / ".backtest"
+FOLD_CACHE_DIR = BACKTEST_DIR / "folds"
+REPORT_PATH = BACKTEST_DIR / "latest.json"
+
+# per frequency: season length, minimum training points, horizons to report
+SETTINGS = {
+    "daily": {"season": 7, "min_train": 45, "horizons": [1, 7, 30], "step": 3},
+    "hourly": {"season": 24, "min_train": 14 * 24, "horizons": [1, 6, 24], "step": 24},
+}
+
+
+class ModelUnavailable(Exception):
+    pass
+
+
+def load_hourly_series():
+    """Total cost per timestamp of the raw hourly rows (retention window) as a ds/y DataFrame."""
+    df = read_raw_hourly(usecols=["timestamp", "cost"])
+    df["ds"] = pd.to_datetime(df["timestamp"], format=TIMESTAMP_FORMAT, errors="coerce")
+    df = df.dropna(subset=["ds"])
+    return df.groupby("ds", as_index=False)["cost"].sum().rename(columns={"cost": "y"}).sort_values("ds").reset_index(drop=True)
+
+
+# ---------------------------------------------------------------
+# Models: (train ds/y frame, ds of the points to predict, season) -> predictions
+# ---------------------------------------------------------------
+def _rolling_mean(train, test_ds, season):
+    # same idea as the fallback in forecast_model: mean of the last window carried forward
+    return np.full(len(test_ds), float(train["y"].tail(season).mean()))
+
+
+def _seasonal_naive(train, test_ds, season):
+    last = train["y"].to_numpy()[-season:]
+    return np.resize(last, len(test_ds)).astype(float)
+
+
+def _prophet(train, test_ds, season):
+    kwargs = {"daily_seasonality": True} if season == 7 else {}
+    model = fit_prophet(train, **kwargs)
+    if model is None:
+        raise ModelUnavailable("prophet")
+    return model.predict(pd.DataFrame({"ds": test_ds}))["yhat"].to_numpy()
+
+
+MODELS = {
+    "prophet": _prophet,
+    "rolling_mean": _rolling_mean,
+    "seasonal_naive": _seasonal_naive,
+}
+
+
+def _fold_origins(n, min_train, max_horizon, step, max_folds):
+    last_origin = n - max_horizon
+    if last_origin < min_train:
+        return []
+    origins = list(range(last_origin, min_train - 1, -step))[:max_folds]
+    return sorted(origins)
+
+
+def _fold_key(model, freq, df, origin, horizon):
+    # hash only the rows the fold sees, so appending data keeps older folds valid
+    window = df.iloc[:origin + horizon]
+    h = hashlib.sha1()
+    h.update(f"{model}|{freq}|{origin}|{horizon}".encode())
+    h.update(window["ds"].to_numpy().astype("datetime64[s]").tobytes())
+    h.update(window["y"].to_numpy(dtype=float).tobytes())
+    return h.hexdigest()
+
+
+def _run_fold(model, freq, df, origin, horizon):
+    train = df.iloc[:origin]
+    test = df.iloc[origin:origin + horizon]
+    try:
+        pred = MODELS[model](train, test["ds"].reset_index(drop=True), SETTINGS[freq]["season"])
+    except ModelUnavailable:
+        return None
+    return {"pred": [float(v) for v in pred], "actual": [float(v) for v in test["y"]]}
+
+
+def _read_cached(key):
+    path = FOLD_CACHE_DIR / f"{key}.json"
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, payload):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(path, json.dumps(payload))
+
+
+def _score(folds, horizons):
+    """MAE / MAPE over steps 1..h for each horizon h, pooled across folds."""
+    out = {}
+    for h in horizons:
+        pred = np.concatenate([np.asarray(f["pred"][:h]) for f in folds])
+        actual = np.concatenate([np.asarray(f["actual"][:h]) for f in folds])
+        err = np.abs(pred - actual)
+        nonzero = actual != 0
+        mape = float(np.mean(err[nonzero] / np.abs(actual[nonzero])) * 100) if nonzero.any() else None
+        out[str(h)] = {
+            "mae": round(float(err.mean()), 4),
+            "mape": round(mape, 2) if mape is not None else None,
+            "folds": len(folds),
+        }
+    return out
+
+
+def run_backtest(freq="daily", models=None, max_folds=8, workers=None, use_cache=True):
+    """
+    Rolling-origin backtest of the given models on the daily or hourly series.
+    Returns {"n_obs", "origins", "models": {name: {"available", "horizons": {h: metrics}}}}.
+    """
+    cfg = SETTINGS[freq]
+    df = load_daily_series() if freq == "daily" else load_hourly_series()
+    models = list(models or MODELS)
+    max_h = max(cfg["horizons"])
+    origins = _fold_origins(len(df), cfg["min_train"], max_h, cfg["step"], max_folds)
+
+    results = {}
+    pending = []
+    for model in models:
+        for origin in origins:
+            key = _fold_key(model, freq, df, origin, max_h)
+            cached = _read_cached(key) if use_cache else None
+            if cached is not None:
+                results[(model, origin)] = cached
+            else:
+                pending.append((model, origin, key))
+
+    workers = workers or os.cpu_count() or 1
+    computed = []
+    if len(pending) > 1 and workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+                futures = [pool.submit(_run_fold, model, freq, df, origin, max_h) for model, origin, _ in pending]
+                computed = [f.result() for f in futures]
+        except (OSError, RuntimeError):
+            computed = []  # no process pool here (sandbox / restricted host): run serially
+    if len(computed) != len(pending):
+        computed = [_run_fold(model, freq, df, origin, max_h) for model, origin, _ in pending]
+
+    for (model, origin, key), fold in zip(pending, computed):
+        if fold is None:
+            continue
+        results[(model, origin)] = fold
+        if use_cache:
+            _write_json(FOLD_CACHE_DIR / f"{key}.json", fold)
+
+    report = {"n_obs": len(df), "origins": origins, "models": {}}
+    for model in models:
+        folds = [results[(model, o)] for o in origins if (model, o) in results]
+        report["models"][model] = {
+            "available": bool(folds),
+            "horizons": _score(folds, cfg["horizons"]) if folds else {},
+        }
+    return report
+
+
+def run_all(freqs=("daily", "hourly"), **kwargs):
+    """Backtest every frequency and save the report for the dashboard."""
+    report = {"generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    for freq in freqs:
+        report[freq] = run_backtest(freq, **kwargs)
+    _write_json(REPORT_PATH, report)
+    return report
+
+
+def load_latest_accuracy(freq="daily", horizon=30):
+    """
+    Accuracy of the model behind `predicted_next_month` from the last saved report.
+    Prophet if it was backtested, otherwise the rolling-mean fallback. None if no report yet.
+    """
+    try:
+        report = json.loads(REPORT_PATH.read_text())
+    except (OSError, ValueError):
+        return None
+
+    models = report.get(freq, {}).get("models", {})
+    for name in ("prophet", "rolling_mean"):
+        metrics = models.get(name, {}).get("horizons", {}).get(str(horizon))
+        if metrics:
+            return {"model": name, "horizon": horizon, "generated_at": report.get("generated_at"), **metrics}
+    return None
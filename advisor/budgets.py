@@ -0,0 +1,116 @@
+# advisor/budgets.py
+"""
+Budget tracking. Each Budget keeps its own running spend for the current period,
+so an ingested row costs one small update per matching budget instead of a
+re-sum of the history. A burn-rate projection (spent / elapsed share of the period)
+is checked on every update; the first forecasted breach and the first actual
+breach in a period each send one email to the owner's notification list.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Budget
+from . import cost_breakdown
+
+LEVELS = ["", "forecast", "breach"]
+# no burn-rate alerts from the first 10% of a period: too little data to extrapolate
+FORECAST_MIN_ELAPSED = 0.10
+
+
+def _row_time(row):
+    ts = row["timestamp"]
+    if isinstance(ts, str):
+        ts = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
+    if timezone.is_naive(ts):
+        ts = timezone.make_aware(ts)
+    return ts
+
+
+def evaluate(budget, when):
+    """Alert level of a budget right now: "", "forecast" or "breach"."""
+    if budget.spent >= budget.amount:
+        return "breach"
+    start, end = budget.period_bounds(when)
+    elapsed = (when - start).total_seconds() / (end - start).total_seconds()
+    if elapsed >= FORECAST_MIN_ELAPSED and budget.projected(when) > budget.amount:
+        return "forecast"
+    return ""
+
+
+def open_budget(budget, when=None):
+    """
+    Start the running state of a new budget from spend already recorded this period
+    (one prefix-sum lookup in the cost breakdown aggregates). A budget that is already
+    forecast to break, or broken, alerts right away.
+    """
+    when = when or timezone.now()
+    start, _ = budget.period_bounds(when)
+    budget.period_start = start
+    budget.spent = cost_breakdown.spend_between(start.date(), when.date(), service=budget.service or None)
+    budget.last_spend_at = when
+    budget.alert_level = evaluate(budget, when)
+    budget.save()
+    if budget.alert_level:
+        notify(budget, budget.alert_level, when)
+    return budget
+
+
+def record_spend(row):
+    """Apply one ingested cost row to every budget it counts against."""
+    when = _row_time(row)
+    cost = float(row["cost"])
+    alerts = []
+
+    with transaction.atomic():
+        matching = Budget.objects.select_for_update().select_related("user").filter(Q(service="") | Q(service=row["service"]))
+        for budget in matching:
+            start, _ = budget.period_bounds(when)
+            if budget.period_start != start:
+                if budget.period_start and when < budget.period_start:
+                    continue  # late row from a period that is already closed
+                budget.period_start, budget.spent, budget.alert_level = start, 0.0, ""
+
+            budget.spent += cost
+            budget.last_spend_at = when
+            level = evaluate(budget, when)
+            if LEVELS.index(level) > LEVELS.index(budget.alert_level):
+                budget.alert_level = level
+                alerts.append((budget, level))
+            budget.save(update_fields=["period_start", "spent", "last_spend_at", "alert_level"])
+
+    for budget, level in alerts:
+        notify(budget, level, when)
+    return alerts
+
+
+def notify(budget, level, when):
+    user = budget.user
+    recipients = [user.email] if user.email else []
+    try:
+        recipients += user.profile.get_email_list()
+    except Exception:
+        pass
+    if not recipients:
+        return
+
+    scope = budget.service or "all services"
+    projected = round(budget.projected(when), 2)
+    if level == "breach":
+        subject = f"[CloudPulse AI] Budget exceeded: {scope} ({budget.period})"
+    else:
+        subject = f"[CloudPulse AI] Budget forecast to be exceeded: {scope} ({budget.period})"
+    body = (
+        f"Budget: ${budget.amount:.2f} {budget.period} for {scope}\n"
+        f"Spent so far: ${budget.spent:.2f} ({budget.used_pct}%)\n"
+        f"Projected for the period at the current burn rate: ${projected:.2f}\n"
+        f"As of {when.strftime('%Y-%m-%d %H:%M')}\n"
+    )
+    try:
+        send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, recipients, fail_silently=True)
+    except Exception as e:
+        print("Budget email send failed:", e)
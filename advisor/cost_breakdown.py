@@ -0,0 +1,331 @@
+# advisor/cost_breakdown.py
+"""
+Cost breakdown by service / category / period.
+
+Daily per-service costs are kept in a NumPy matrix with running (prefix) sums, so
+any date range costs two row lookups. The matrix is seeded once from
+billing_detailed.csv (+ newer hourly rows, compacted and raw) and then kept up to
+date by reading only the bytes appended to billing_hourly.csv since the last sync.
+Query results are cached per (tenant, range, dimension, period) and dropped
+whenever the aggregates change.
+"""
+import io
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from advisor import retention
+from advisor.data_generator import SERVICES as GENERATED_SERVICES
+from advisor.storage import data_dir, read_csv
+
+DIMENSIONS = ("service", "category")
+PERIODS = ("day", "week", "month", "total")
+RESULT_CACHE_SIZE = 256
+
+# live rows in billing_hourly.csv have no category; fall back to the generator's mapping
+_DEFAULT_CATEGORIES = {s["name"]: s["category"] for s in GENERATED_SERVICES}
+
+
+def _day(value):
+    return np.datetime64(pd.Timestamp(value).date(), "D")
+
+
+class CostAggregates:
+    """Daily cost per service, with prefix sums for O(1) range totals."""
+
+    def __init__(self):
+        self.services = []
+        self.categories = {}  # service -> category
+        self._col = {}
+        self._dates = np.empty(0, dtype="datetime64[D]")
+        self._daily = np.zeros((0, 0))
+        self._prefix = np.zeros((1, 0))  # row i = sum of days [0, i)
+        self.version = 0
+
+    # --- building -------------------------------------------------
+    def _column(self, service, category=None):
+        col = self._col.get(service)
+        if col is None:
+            col = len(self.services)
+            self._col[service] = col
+            self.services.append(service)
+            self._daily = np.hstack([self._daily, np.zeros((len(self._dates), 1))])
+            self._prefix = np.hstack([self._prefix, np.zeros((len(self._dates) + 1, 1))])
+        if category and not self.categories.get(service):
+            self.categories[service] = category
+        return col
+
+    def add_frame(self, df):
+        """Add rows of a date/service/category/cost frame."""
+        if df.empty:
+            return
+        grouped = df.groupby(["date", "service"], as_index=False)["cost"].sum()
+        cats = df.dropna(subset=["category"]).drop_duplicates("service").set_index("service")["category"]
+        for svc in grouped["service"].unique():
+            self._column(svc, cats.get(svc) or _DEFAULT_CATEGORIES.get(svc))
+
+        days = grouped["date"].to_numpy(dtype="datetime64[D]")
+        new_days = np.setdiff1d(np.unique(days), self._dates)
+        first_changed = len(self._dates)
+        if len(new_days):
+            dates = np.union1d(self._dates, new_days)
+            daily = np.zeros((len(dates), len(self.services)))
+            daily[np.searchsorted(dates, self._dates)] = self._daily
+            first_changed = int(np.searchsorted(dates, new_days[0]))
+            self._dates, self._daily = dates, daily
+
+        rows = np.searchsorted(self._dates, days)
+        cols = grouped["service"].map(self._col).to_numpy()
+        np.add.at(self._daily, (rows, cols), grouped["cost"].to_numpy(dtype=float))
+        first_changed = min(first_changed, int(rows.min()))
+
+        # only rebuild prefix sums from the first touched day (usually just the last row)
+        prefix = np.zeros((len(self._dates) + 1, len(self.services)))
+        prefix[:first_changed + 1] = self._prefix[:first_changed + 1]
+        prefix[first_changed + 1:] = prefix[first_changed] + np.cumsum(self._daily[first_changed:], axis=0)
+        self._prefix = prefix
+        self.version += 1
+
+    # --- queries --------------------------------------------------
+    @property
+    def first_date(self):
+        return self._dates[0] if len(self._dates) else None
+
+    @property
+    def last_date(self):
+        return self._dates[-1] if len(self._dates) else None
+
+    def _bounds(self, start, end):
+        return (
+            int(np.searchsorted(self._dates, start, side="left")),
+            int(np.searchsorted(self._dates, end, side="right")),
+        )
+
+    def range_totals(self, start, end):
+        """Per-service totals for start..end inclusive."""
+        i, j = self._bounds(start, end)
+        return self._prefix[j] - self._prefix[i]
+
+    def period_totals(self, start, end, period):
+        """(period labels, matrix periods x services) for start..end inclusive."""
+        i, j = self._bounds(start, end)
+        dates, daily = self._dates[i:j], self._daily[i:j]
+        if not len(dates):
+            return [], np.zeros((0, len(self.services)))
+        if period == "day":
+            keys = dates
+        elif period == "week":
+            d = dates.astype(np.int64)
+            keys = (d - (d + 3) % 7).astype("datetime64[D]")  # monday of the week (1970-01-01 was a thursday)
+        else:
+            keys = dates.astype("datetime64[M]").astype("datetime64[D]")
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        return [str(k) for k in keys[starts]], np.add.reduceat(daily, starts, axis=0)
+
+    def group_columns(self, matrix, dimension):
+        """Collapse service columns into (labels, matrix) for the requested dimension."""
+        if dimension == "service":
+            return list(self.services), matrix
+        labels = sorted({self.categories.get(s) or "Other" for s in self.services})
+        idx = {c: k for k, c in enumerate(labels)}
+        out = np.zeros(matrix.shape[:-1] + (len(labels),))
+        for col, svc in enumerate(self.services):
+            out[..., idx[self.categories.get(svc) or "Other"]] += matrix[..., col]
+        return labels, out
+
+
+class BreakdownStore:
+    """Aggregates + sync state for billing_hourly.csv + per-tenant result cache."""
+
+    def __init__(self, advisor_dir=None):
+        self.advisor_dir = Path(advisor_dir) if advisor_dir else None  # None: storage.data_dir()
+        self.lock = threading.RLock()
+        self.aggregates = None
+        self._offset = 0  # bytes of billing_hourly.csv already folded in
+        self._tail = b""  # the last line we read, to notice rewrites
+        self._header = None
+        self._results = OrderedDict()
+
+    @property
+    def detailed_path(self):
+        return (self.advisor_dir or data_dir()) / "billing_detailed.csv"
+
+    @property
+    def hourly_path(self):
+        return (self.advisor_dir or data_dir()) / "billing_hourly.csv"
+
+    def _seed(self):
+        agg = CostAggregates()
+        last_detailed = None
+        if self.detailed_path.exists():
+            det = read_csv(self.detailed_path)
+            if not det.empty:
+                det = det.rename(columns={"daily_cost": "cost"})
+                det["date"] = pd.to_datetime(det["date"], errors="coerce")
+                det = det.dropna(subset=["date"])
+                agg.add_frame(det)
+                last_detailed = det["date"].max()
+
+        # hourly rows compacted by advisor/retention.py, as daily totals
+        tier = retention.load_daily_tier()
+        if not tier.empty:
+            tier["date"] = pd.to_datetime(tier["date"], errors="coerce")
+            if last_detailed is not None:
+                tier = tier[tier["date"] > last_detailed]
+            agg.add_frame(tier[["date", "service", "category", "cost"]])
+
+        # raw rows below the compaction watermark are already in the tier
+        after = last_detailed
+        watermark = retention.compacted_before()
+        if watermark is not None:
+            before_watermark = watermark - pd.Timedelta(days=1)
+            after = before_watermark if after is None else max(after, before_watermark)
+
+        self.aggregates = agg
+        # fresh aggregates restart their version count, so cached results can't be told apart
+        self._results.clear()
+        self._offset, self._tail, self._header = 0, b"", None
+        self._read_hourly_tail(after=after)
+
+    def _read_hourly_tail(self, after=None):
+        if not self.hourly_path.exists():
+            return
+        with open(self.hourly_path, "rb") as fh:
+            if self._offset:
+                fh.seek(self._offset - len(self._tail))
+                if fh.read(len(self._tail)) != self._tail:
+                    raise _Rewritten()
+            else:
+                self._header = fh.readline()
+            data = fh.read()
+
+        # only fold complete lines; a partial last line is picked up next time
+        end = data.rfind(b"\n") + 1
+        if not end:
+            if not self._offset:
+                self._offset = len(self._header)
+                self._tail = self._header
+            return
+        data = data[:end]
+        start_offset = self._offset or len(self._header)
+        self._offset = start_offset + end
+        self._tail = data[data.rfind(b"\n", 0, end - 1) + 1:]
+
+        df = pd.read_csv(io.BytesIO(self._header + data))
+        if df.empty:
+            return
+        df["timestamp"] = pd.to_datetime(df["timestamp"], format=retention.TIMESTAMP_FORMAT, errors="coerce")
+        df = df.dropna(subset=["timestamp"])
+        df["date"] = df["timestamp"].dt.normalize()
+        if after is not None:
+            df = df[df["date"] > after]
+        if "category" not in df.columns:
+            df["category"] = None
+        self.aggregates.add_frame(df[["date", "service", "category", "cost"]])
+
+    def sync(self):
+        """Fold in whatever was appended to billing_hourly.csv since the last call."""
+        with self.lock:
+            if self.aggregates is None:
+                self._seed()
+                return
+            try:
+                self._read_hourly_tail()
+            except _Rewritten:
+                self._seed()
+
+    def breakdown(self, tenant, start=None, end=None, dimension="service", period="total", movers=5):
+        self.sync()
+        with self.lock:
+            agg = self.aggregates
+            if agg.last_date is None:
+                return {"dimension": dimension, "period": period, "start": None, "end": None,
+                        "totals": {}, "series": {"periods": [], "values": {}}, "top_movers": []}
+
+            end = _day(end) if end else agg.last_date
+            start = _day(start) if start else end - np.timedelta64(29, "D")
+            if start > end:
+                raise ValueError("start must not be after end")
+            key = (tenant, str(start), str(end), dimension, period, movers)
+            cached = self._results.get(key)
+            if cached is not None and cached[0] == agg.version:
+                self._results.move_to_end(key)
+                return cached[1]
+
+            result = self._compute(agg, start, end, dimension, period, movers)
+            self._results[key] = (agg.version, result)
+            self._results.move_to_end(key)
+            while len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+            return result
+
+    def _compute(self, agg, start, end, dimension, period, movers):
+        labels, totals = agg.group_columns(agg.range_totals(start, end), dimension)
+        result = {
+            "dimension": dimension,
+            "period": period,
+            "start": str(start),
+            "end": str(end),
+            "totals": {k: round(float(v), 2) for k, v in zip(labels, totals)},
+        }
+
+        if period == "total":
+            result["series"] = {"periods": [str(start)], "values": {k: [v] for k, v in result["totals"].items()}}
+        else:
+            periods, matrix = agg.period_totals(start, end, period)
+            _, matrix = agg.group_columns(matrix, dimension)
+            result["series"] = {
+                "periods": periods,
+                "values": {k: np.round(matrix[:, n], 2).tolist() for n, k in enumerate(labels)},
+            }
+
+        # week-over-week movers, relative to the end of the range
+        week = np.timedelta64(7, "D")
+        _, this_week = agg.group_columns(agg.range_totals(end - week + 1, end), dimension)
+        _, last_week = agg.group_columns(agg.range_totals(end - 2 * week + 1, end - week), dimension)
+        changes = []
+        for k, cur, prev in zip(labels, this_week, last_week):
+            changes.append({
+                dimension: k,
+                "this_week": round(float(cur), 2),
+                "last_week": round(float(prev), 2),
+                "change": round(float(cur - prev), 2),
+                "change_pct": round(float((cur - prev) / prev * 100), 1) if prev else None,
+            })
+        result["top_movers"] = sorted(changes, key=lambda c: abs(c["change"]), reverse=True)[:movers]
+        return result
+
+
+class _Rewritten(Exception):
+    """billing_hourly.csv no longer starts with what we already read."""
+
+
+_store = BreakdownStore()
+
+
+def get_breakdown(tenant, start=None, end=None, dimension="service", period="total"):
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"dimension must be one of {', '.join(DIMENSIONS)}")
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    return _store.breakdown(tenant, start=start, end=end, dimension=dimension, period=period)
+
+
+def spend_between(start, end, service=None):
+    """Total cost from start to end (dates, inclusive), for one service or all of them."""
+    _store.sync()
+    with _store.lock:
+        agg = _store.aggregates
+        totals = agg.range_totals(_day(start), _day(end))
+        if service is None:
+            return round(float(totals.sum()), 2)
+        col = agg._col.get(service)
+        return round(float(totals[col]), 2) if col is not None else 0.0
+
+
+def record_ingest():
+    """Called after rows are appended to billing_hourly.csv: fold them in right away."""
+    _store.sync()
@@ -0,0 +1,77 @@
+# advisor/dashboard_cache.py
+"""
+Cache for the pieces of the dashboard context (chart, anomalies, recs, summary).
+
+Keys carry the storage data_version of every CSV the piece is computed from, so an
+ingest into billing_hourly.csv invalidates the chart and anomalies but leaves the
+(expensive, daily-data based) forecast summary cached. Hit/miss counts per piece are
+kept in the same cache.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from advisor import storage
+
+# which data files each cached piece is computed from
+DEPENDS_ON = {
+    "chart": ("billing_hourly.csv",),
+    "anomalies": ("billing_hourly.csv", "billing_hourly_profile.csv"),
+    "recs": (),
+    "forecast": ("billing_daily.csv",),
+    "summary": ("billing_daily.csv",),
+}
+
+_MISSING = object()
+
+
+def _file_version(path):
+    # write counter from storage, plus mtime to also catch files replaced out of band
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        mtime = 0
+    return f"{storage.data_version(path)}-{mtime}"
+
+
+def data_version(piece):
+    return ".".join(_file_version(storage.data_path(name)) for name in DEPENDS_ON[piece]) or "0"
+
+
+def _timeout():
+    return getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 3600)
+
+
+def _count(piece, outcome):
+    key = f"dashboard:stats:{piece}:{outcome}"
+    try:
+        cache.incr(key)
+    except ValueError:  # first hit/miss for this piece
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_or_compute(piece, user_id, compute):
+    """
+    Cached value of `piece` for this user at the current data version, computing it on a miss.
+    Returns (value, "hit" | "miss").
+    """
+    key = f"dashboard:{piece}:{data_version(piece)}:{user_id}"
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(piece, "hit")
+        return value, "hit"
+
+    value = compute()
+    cache.set(key, value, timeout=_timeout())
+    _count(piece, "miss")
+    return value, "miss"
+
+
+def cache_stats():
+    """{piece: {"hit": n, "miss": n}} for this cache backend (per process for locmem)."""
+    keys = [f"dashboard:stats:{piece}:{outcome}" for piece in DEPENDS_ON for outcome in ("hit", "miss")]
+    values = cache.get_many(keys)
+    return {
+        piece: {outcome: values.get(f"dashboard:stats:{piece}:{outcome}", 0) for outcome in ("hit", "miss")}
+        for piece in DEPENDS_ON
+    }
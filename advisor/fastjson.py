@@ -0,0 +1,38 @@
+# advisor/fastjson.py
+"""
+JSON encoding for the chart payloads. Uses orjson (pinned in requirements.txt; it
+writes NumPy arrays natively, no .tolist() round trip). Without it, e.g. in a bare
+checkout, the standard json module with compact separators is used instead.
+"""
+import json
+
+import numpy as np
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, default=_default, separators=(",", ":")).encode()
+
+
+def dumps(data):
+    return dumps_bytes(data).decode()
+
+
+def json_response(data, status=200):
+    """Drop-in for JsonResponse(data) that understands NumPy arrays."""
+    return HttpResponse(dumps_bytes(data), content_type="application/json", status=status)
@@ -1,24 +1,39 @@
 # advisor/forecast_hourly.py
+import threading
+import time
+
+import numpy as np
 import pandas as pd
-from prophet import Prophet
 from pathlib import Path
 from django.conf import settings
 
+from advisor import live_buffer, retention
+
 BASE_DIR = Path(settings.BASE_DIR)
 
+# how far ahead the cached forecast reaches and how often it is refitted
+HORIZON_HOURS = 48
+REFIT_SECONDS = getattr(settings, "HOURLY_FORECAST_REFIT_SECONDS", 900)
+# 80% band
+BAND_Z = 1.2816
+FACTOR_RANGE = (0.25, 4.0)
+
 def train_and_forecast_hourly():
-    path = BASE_DIR / "advisor" / "billing_hourly.csv"
-    df = pd.read_csv(path)
+    try:
+        from prophet import Prophet
+    except Exception:
+        Prophet = None
+
+    df = retention.read_raw_hourly()
 
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    df["timestamp"] = pd.to_datetime(df["timestamp"], format=retention.TIMESTAMP_FORMAT, errors="coerce")
 
     # Prophet needs ds and y
     df = df.rename(columns={"timestamp": "ds", "cost": "y"})
     df = df[["ds", "y"]]
 
-    model = Prophet()
-
     try:
+        model = Prophet()
         model.fit(df)
     except:
         # fallback
@@ -32,3 +47,175 @@ def train_and_forecast_hourly():
 
     forecast = forecast[["ds", "yhat"]]
     return forecast
+
+
+# ---------------------------------------------------------------
+# Hour-of-day / weekday profile model used by the live chart
+# ---------------------------------------------------------------
+def profile_stats(df):
+    """
+    count / sum / sum of squares of cost per (service, weekday, hour), plus rsum / rsumsq:
+    the same sums of each cost divided by the service's mean cost that day.
+    """
+    ts = pd.to_datetime(df["timestamp"], format=retention.TIMESTAMP_FORMAT, errors="coerce")
+    df = pd.DataFrame({"service": df["service"], "day": ts.dt.normalize(), "weekday": ts.dt.weekday,
+                       "hour": ts.dt.hour, "cost": df["cost"]}).dropna()
+    df = df.astype({"weekday": int, "hour": int})
+    df["sq"] = df["cost"] ** 2
+    # relative to its own day, so days at different scales (old history, live ticks) share a profile
+    day_mean = df.groupby(["service", "day"])["cost"].transform("mean")
+    df["ratio"] = (df["cost"] / day_mean.where(day_mean > 0)).fillna(1.0)
+    df["rsq"] = df["ratio"] ** 2
+    stats = df.groupby(["service", "weekday", "hour"]).agg(count=("cost", "size"), sum=("cost", "sum"), sumsq=("sq", "sum"),
+                                                          rsum=("ratio", "sum"), rsumsq=("rsq", "sum"))
+    return stats
+
+
+def load_profile_stats():
+    """Stats of the raw hourly rows plus those already compacted by advisor/retention.py."""
+    raw = profile_stats(retention.read_raw_hourly(usecols=["timestamp", "service", "cost"]))
+    return retention.add_stats(raw, retention.load_profile_tier())
+
+
+def fit_profiles(stats, services):
+    """
+    Per service: multiplicative factor and relative std for every (weekday, hour) slot,
+    as 7x24 arrays. The factor is the slot's mean cost relative to its day's mean, so the
+    scale of the days it was seen on doesn't matter. Slots without history get factor 1
+    and the service's average spread.
+    """
+    profiles = {}
+    for svc in services:
+        factor = np.ones((7, 24))
+        rel_std = np.zeros((7, 24))
+        if svc in stats.index.get_level_values(0):
+            s = stats.loc[svc]
+            count, rsum, rsumsq = s["count"].to_numpy(float), s["rsum"].to_numpy(float), s["rsumsq"].to_numpy(float)
+            wd, hr = s.index.get_level_values(0).to_numpy(), s.index.get_level_values(1).to_numpy()
+            mean = rsum / count
+            var = np.maximum(rsumsq / count - mean ** 2, 0.0)
+            # clipped so a handful of outlier rows in one slot can't swamp the profile
+            factor[wd, hr] = np.clip(mean, *FACTOR_RANGE)
+            rel = np.sqrt(var) / np.where(mean > 0, mean, 1.0)
+            rel_std[:] = float(np.average(rel, weights=count))
+            rel_std[wd, hr] = rel
+        profiles[svc] = (factor, rel_std)
+    return profiles
+
+
+def _slot(epochs):
+    days = epochs // 86400
+    return (days + 3) % 7, (epochs // 3600) % 24  # 1970-01-01 was a thursday (weekday 3)
+
+
+def _step(epochs):
+    """Spacing of the window's slots: an hour for hourly data, less for the faster live ticks."""
+    gaps = np.diff(epochs)
+    gaps = gaps[gaps > 0]
+    return int(np.clip(np.median(gaps), 1, 3600)) if len(gaps) else 3600
+
+
+def forecast_from_profiles(profiles, services, epochs, costs, horizon=HORIZON_HOURS):
+    """
+    Mean total cost over the recent window (costs: one column per service, then the total)
+    times the profile for the next `horizon` slots, relative to the profile's mean over the
+    window. The level comes from the window's own totals, so no factor can rescale it.
+    The profile of the total is each service's profile weighted by its share of the window,
+    so a window where every slot holds a single service still gets the right level.
+    Returns (epochs, yhat, lower, upper) arrays.
+    """
+    if not len(epochs):
+        return np.empty(0, np.int64), np.empty(0), np.empty(0), np.empty(0)
+
+    n = len(services)
+    spend = costs[:, :n].sum(axis=0)
+    share = spend / spend.sum() if spend.sum() > 0 else np.full(n, 1.0 / n)
+
+    def total_profile(at):
+        wd, hr = _slot(at)
+        factor = sum(share[c] * profiles[svc][0][wd, hr] for c, svc in enumerate(services))
+        rel_std = sum(share[c] * profiles[svc][1][wd, hr] for c, svc in enumerate(services))
+        return factor, rel_std
+
+    recent_factor, _ = total_profile(epochs)
+    scale = float(np.mean(recent_factor))
+    level = float(np.mean(costs[:, -1]))
+    deseasonalised = costs[:, -1] * scale / recent_factor
+
+    future = epochs[-1] + np.arange(1, horizon + 1) * _step(epochs)
+    factor, rel_std = total_profile(future)
+    yhat = level * factor / scale
+    if len(deseasonalised) > 1 and level > 0:
+        # spread of the window itself around its level; the profile's own spread only
+        # stands in when there is a single point to go on
+        rel_std = np.full(horizon, float(np.std(deseasonalised)) / level)
+    spread = BAND_Z * yhat * rel_std
+    return future, yhat, np.maximum(0.0, yhat - spread), yhat + spread
+
+
+class HourlyForecastService:
+    """
+    Keeps a fitted profile model and the forecast horizon in memory.
+    Refits in a background thread every REFIT_SECONDS (or when the live window has
+    moved past the cached horizon); requests only slice the cached arrays.
+    """
+
+    def __init__(self, refit_seconds=REFIT_SECONDS, horizon=HORIZON_HOURS):
+        self.refit_seconds = refit_seconds
+        self.horizon = horizon
+        self._lock = threading.Lock()
+        self._refitting = False
+        self._fitted_at = 0.0
+        self._cached = None  # (epochs, yhat, lower, upper)
+
+    def fit(self):
+        buf = live_buffer.get_live_buffer()
+        profiles = fit_profiles(load_profile_stats(), buf.services)
+        epochs, costs = buf.snapshot(24)
+        future, yhat, lower, upper = forecast_from_profiles(profiles, buf.services, epochs, costs, self.horizon)
+        cached = (future, np.round(yhat, 2), np.round(lower, 2), np.round(upper, 2))
+        with self._lock:
+            self._cached = cached
+            self._fitted_at = time.time()
+            self._refitting = False
+
+    def _refit_in_background(self):
+        with self._lock:
+            if self._refitting:
+                return
+            self._refitting = True
+
+        def run():
+            try:
+                self.fit()
+            except Exception as e:
+                print("Hourly forecast refit failed:", e)
+                with self._lock:
+                    self._refitting = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def next_hours(self, hours=12):
+        """
+        Next `hours` points after the newest live hour, as columns:
+        {"timestamps" (epoch seconds), "predicted", "lower", "upper"}.
+        """
+        if self._cached is None:
+            self.fit()
+        epochs, yhat, lower, upper = self._cached
+
+        newest, _ = live_buffer.get_live_buffer().totals(1)
+        last_epoch = int(newest[-1]) if len(newest) else 0
+        start = int(np.searchsorted(epochs, last_epoch, side="right"))
+        if time.time() - self._fitted_at > self.refit_seconds or start + hours > len(epochs):
+            self._refit_in_background()
+
+        window = slice(start, start + hours)
+        return {"timestamps": epochs[window], "predicted": yhat[window], "lower": lower[window], "upper": upper[window]}
+
+
+_service = HourlyForecastService()
+
+
+def next_hours(hours=12):
+    return _service.next_hours(hours)
@@ -2,6 +2,8 @@
 import pandas as pd
 from pathlib import Path
 
+from advisor.storage import data_path, read_csv
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
@@ -13,24 +15,35 @@ def train_and_forecast():
     return train_and_forecast_daily()
 
 
-def train_and_forecast_daily():
+def fit_prophet(df, **kwargs):
     """
-    Train a Prophet model on billing_daily.csv.
-    If Prophet is not installed or fails, fallback to simple rolling mean.
-    Returns a DataFrame with: ds, y, yhat
+    Fit a Prophet model on a ds/y DataFrame.
+    Returns None if Prophet is not installed or fitting fails.
     """
     try:
         from prophet import Prophet
     except Exception:
-        Prophet = None
+        return None
 
-    csv_path = BASE_DIR / "advisor" / "billing_daily.csv"
+    try:
+        model = Prophet(**kwargs)
+        model.fit(df[["ds", "y"]])
+        return model
+    except Exception:
+        return None
+
+
+def load_daily_series():
+    """
+    billing_daily.csv as a ds/y DataFrame sorted by date.
+    Empty frame if the file is missing.
+    """
+    csv_path = data_path("billing_daily.csv")
 
-    # If file missing → return empty forecast
     if not csv_path.exists():
-        return pd.DataFrame(columns=["ds", "y", "yhat"])
+        return pd.DataFrame(columns=["ds", "y"])
 
-    df = pd.read_csv(csv_path)
+    df = read_csv(csv_path)
 
     # Ensure date column exists
     if "date" in df.columns:
@@ -46,16 +59,27 @@ def train_and_forecast_daily():
     else:
         df["y"] = 0
 
-    df = df[["ds", "y"]].sort_values("ds")
+    return df[["ds", "y"]].sort_values("ds").reset_index(drop=True)
+
+
+def train_and_forecast_daily():
+    """
+    Train a Prophet model on billing_daily.csv.
+    If Prophet is not installed or fails, fallback to simple rolling mean.
+    Returns a DataFrame with: ds, y, yhat
+    """
+    df = load_daily_series()
+
+    # If file missing → return empty forecast
+    if df.empty:
+        return pd.DataFrame(columns=["ds", "y", "yhat"])
 
     # -----------------------------------------
     # CASE 1: Prophet installed → real forecasting
     # -----------------------------------------
-    if Prophet is not None:
+    model = fit_prophet(df, daily_seasonality=True)
+    if model is not None:
         try:
-            model = Prophet(daily_seasonality=True)
-            model.fit(df.rename(columns={"ds": "ds", "y": "y"}))
-
             future = model.make_future_dataframe(periods=30)
             forecast = model.predict(future)[["ds", "yhat"]]
 
@@ -0,0 +1,298 @@
+# advisor/live_buffer.py
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from advisor.retention import TIMESTAMP_FORMAT
+from advisor.storage import data_path, file_lock, read_csv, write_lock
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except Exception:
+    shared_memory = None
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# the live chart shows 72 hours, the short-term prediction looks at the last 6
+WINDOW_HOURS = 72
+SERVICES = ["EC2", "RDS", "S3", "CloudFront"]
+
+# header slots (int64): seqlock version, next write index, filled slots, seeded flag, source mtime
+_VERSION, _HEAD, _COUNT, _SEEDED, _SOURCE = range(5)
+_HEADER_SLOTS = 5
+
+
+def _to_epoch(ts):
+    """Seconds since epoch for a datetime / timestamp string (naive times kept as-is)."""
+    return int(pd.Timestamp(ts).to_datetime64().astype("datetime64[s]").astype(np.int64))
+
+
+class HourlyRingBuffer:
+    """
+    Fixed-size ring of the most recent hourly costs.
+    Column i holds SERVICES[i], the last column holds the total of all services.
+    The arrays live in a named shared memory block when shm_name is given,
+    so every worker process reads and writes the same window.
+    """
+
+    def __init__(self, capacity=WINDOW_HOURS, services=SERVICES, shm_name=None):
+        self.capacity = capacity
+        self.services = list(services)
+        self.n_cols = len(self.services) + 1
+        self._col = {s: i for i, s in enumerate(self.services)}
+        self._thread_lock = threading.Lock()
+        self._shm = None
+        self._lock_path = None
+
+        header_bytes = _HEADER_SLOTS * 8
+        ts_bytes = capacity * 8
+        size = header_bytes + ts_bytes + capacity * self.n_cols * 8
+
+        buf = None
+        if shm_name and shared_memory is not None:
+            buf = self._attach_shared(f"{shm_name}_{capacity}x{self.n_cols}", size)
+        if buf is None:
+            buf = bytearray(size)
+
+        self._header = np.ndarray((_HEADER_SLOTS,), dtype=np.int64, buffer=buf, offset=0)
+        self._ts = np.ndarray((capacity,), dtype=np.int64, buffer=buf, offset=header_bytes)
+        self._costs = np.ndarray((capacity, self.n_cols), dtype=np.float64, buffer=buf, offset=header_bytes + ts_bytes)
+
+    def _attach_shared(self, name, size):
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=name)
+        except OSError:
+            return None
+        # keep the block alive when this worker exits; other workers still use it
+        try:
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        except Exception:
+            pass
+        self._lock_path = BASE_DIR / "advisor" / f".{name}.lock"
+        return self._shm.buf
+
+    @property
+    def shared(self):
+        return self._shm is not None
+
+    @contextmanager
+    def _locked(self):
+        # threads of this process and, for a shared block, every other process
+        interprocess = file_lock(self._lock_path) if self._lock_path else nullcontext()
+        with self._thread_lock, interprocess:
+            yield
+
+    @contextmanager
+    def _writing(self):
+        # writers are serialised; readers check the version instead of locking
+        with self._locked():
+            self._header[_VERSION] += 1  # odd -> write in progress
+            try:
+                yield
+            finally:
+                self._header[_VERSION] += 1
+
+    def __len__(self):
+        return int(self._header[_COUNT])
+
+    @property
+    def seeded(self):
+        return bool(self._header[_SEEDED])
+
+    @property
+    def source_mtime(self):
+        return int(self._header[_SOURCE])
+
+    def mark_source(self, mtime_ns):
+        self._header[_SOURCE] = mtime_ns
+
+    def load(self, epochs, costs, source_mtime=0):
+        """Replace the whole window (oldest first). costs has one column per service + total."""
+        epochs = np.asarray(epochs, dtype=np.int64)[-self.capacity:]
+        costs = np.asarray(costs, dtype=np.float64)[-self.capacity:]
+        n = len(epochs)
+        with self._writing():
+            self._ts[:n] = epochs
+            self._costs[:n] = costs
+            self._header[_HEAD] = n % self.capacity
+            self._header[_COUNT] = n
+            self._header[_SEEDED] = 1
+            self._header[_SOURCE] = source_mtime
+
+    def push(self, ts, service, cost):
+        """
+        Add one cost row. Rows sharing a slot's timestamp are summed into that slot.
+        A row older than the newest slot (a concurrent writer got there first) is put
+        in its place in time order; only rows older than a full window are ignored.
+        """
+        epoch = _to_epoch(ts)
+        cost = float(cost)
+        with self._writing():
+            head = int(self._header[_HEAD])
+            count = int(self._header[_COUNT])
+            if count:
+                last = (head - 1) % self.capacity
+                if epoch == self._ts[last]:
+                    self._add(last, service, cost)
+                    return True
+                if epoch < self._ts[last]:
+                    return self._insert(epoch, service, cost)
+            self._ts[head] = epoch
+            self._costs[head] = 0.0
+            self._add(head, service, cost)
+            self._header[_HEAD] = (head + 1) % self.capacity
+            self._header[_COUNT] = min(count + 1, self.capacity)
+        return True
+
+    def _insert(self, epoch, service, cost):
+        # caller holds the write lock; the window is only a few dozen slots, so re-lay it out
+        epochs, costs = self._read(None)
+        pos = int(np.searchsorted(epochs, epoch))
+        if epochs[pos] == epoch:
+            self._add((int(self._header[_HEAD]) - len(epochs) + pos) % self.capacity, service, cost)
+            return True
+        full = len(epochs) == self.capacity
+        if full and pos == 0:
+            return False  # older than the whole window
+        epochs = np.insert(epochs, pos, epoch)[-self.capacity:]
+        costs = np.insert(costs, pos, 0.0, axis=0)[-self.capacity:]
+        n = len(epochs)
+        self._ts[:n] = epochs
+        self._costs[:n] = costs
+        self._header[_HEAD] = n % self.capacity
+        self._header[_COUNT] = n
+        self._add(pos - 1 if full else pos, service, cost)  # a full window dropped its oldest slot
+        return True
+
+    def _add(self, idx, service, cost):
+        col = self._col.get(service)
+        if col is not None:
+            self._costs[idx, col] += cost
+        self._costs[idx, -1] += cost
+
+    def snapshot(self, n=None):
+        """Copy of the newest n slots, oldest first: (epochs, costs)."""
+        for _ in range(1000):
+            version = int(self._header[_VERSION])
+            if version % 2:
+                continue
+            epochs, costs = self._read(n)
+            if int(self._header[_VERSION]) == version:
+                return epochs, costs
+        # a writer kept the version busy; wait for it on the writers' lock instead
+        with self._locked():
+            return self._read(n)
+
+    def _read(self, n):
+        count = int(self._header[_COUNT])
+        head = int(self._header[_HEAD])
+        n = count if n is None else max(0, min(n, count))
+        idx = (head - n + np.arange(n)) % self.capacity
+        return self._ts[idx], self._costs[idx]
+
+    def totals(self, n=None):
+        epochs, costs = self.snapshot(n)
+        return epochs, costs[:, -1]
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def _hourly_csv_path():
+    return data_path("billing_hourly.csv")
+
+
+def _mtime_ns(path):
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+def seed_from_csv(buf, path=None):
+    """Fill the buffer with the last `capacity` hourly totals from billing_hourly.csv."""
+    path = path or _hourly_csv_path()
+    if not path.exists():
+        buf.load([], np.zeros((0, buf.n_cols)))
+        return
+
+    df = read_csv(path, usecols=["timestamp", "service", "cost"])
+    df["timestamp"] = pd.to_datetime(df["timestamp"], format=TIMESTAMP_FORMAT, errors="coerce")
+    df = df.dropna(subset=["timestamp"])
+
+    wide = (
+        df.pivot_table(index="timestamp", columns="service", values="cost", aggfunc="sum", fill_value=0.0)
+        .sort_index()
+        .tail(buf.capacity)
+    )
+    costs = np.zeros((len(wide), buf.n_cols))
+    for svc in wide.columns:
+        col = buf._col.get(svc)
+        if col is not None:
+            costs[:, col] = wide[svc].to_numpy()
+    costs[:, -1] = wide.sum(axis=1).to_numpy()
+    epochs = wide.index.values.astype("datetime64[s]").astype(np.int64)
+    buf.load(epochs, costs, source_mtime=_mtime_ns(path))
+
+
+def get_live_buffer():
+    """Process-wide buffer, seeded from disk once (or again if the CSV changed behind its back)."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                buf = HourlyRingBuffer(shm_name=getattr(settings, "LIVE_BUFFER_SHM_NAME", None))
+                path = _hourly_csv_path()
+                # under the writer lock: an ingest appends and pushes under it too, so a
+                # seed never sees a row whose push is still to come
+                with write_lock(path):
+                    if not buf.seeded or buf.source_mtime != _mtime_ns(path):
+                        seed_from_csv(buf, path)
+                _buffer = buf
+    return _buffer
+
+
+def record_hour(row):
+    """
+    Called on ingestion as the `on_written` callback of the billing_hourly.csv append,
+    i.e. under its writer lock. Call get_live_buffer() before appending: seeding takes
+    that lock too, and a buffer seeded after the append would count the row twice.
+    """
+    buf = get_live_buffer()
+    buf.push(row["timestamp"], row["service"], row["cost"])
+    buf.mark_source(_mtime_ns(_hourly_csv_path()))
+
+
+def hourly_chart_columns(n=WINDOW_HOURS, since=None):
+    """
+    Columnar chart payload: {"timestamps": epoch seconds, "costs": totals}.
+    With `since`, only slots at or after that epoch (the newest slot may have grown).
+    """
+    epochs, totals = get_live_buffer().totals(n)
+    if since is not None:
+        keep = epochs >= since
+        epochs, totals = epochs[keep], totals[keep]
+    return {"timestamps": epochs, "costs": np.round(totals, 2)}
+
+
+def recent_total(n):
+    _, totals = get_live_buffer().totals(n)
+    return round(float(totals.sum()), 2)
+
+
+def short_term_forecast(hours=12, window=6):
+    """Linear extrapolation from the first to the last of the newest `window` totals."""
+    epochs, totals = get_live_buffer().totals(window)
+    if len(totals) < window:
+        return {"timestamps": np.empty(0, np.int64), "predicted": np.empty(0)}
+    coef = (totals[-1] - totals[0]) / max(1, window - 1)
+    steps = np.arange(1, hours + 1)
+    preds = np.maximum(0.1, totals[-1] + coef * steps)
+    return {"timestamps": epochs[-1] + steps * 3600, "predicted": np.round(preds, 2)}
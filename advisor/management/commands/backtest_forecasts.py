@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from advisor.backtesting import MODELS, run_all
+
+
+class Command(BaseCommand):
+    help = "Rolling-origin backtest of the daily/hourly forecasts; saves the report shown on the dashboard."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--freq", choices=["daily", "hourly", "all"], default="all")
+        parser.add_argument("--model", action="append", choices=sorted(MODELS), help="repeatable, default: all models")
+        parser.add_argument("--max-folds", type=int, default=8)
+        parser.add_argument("--workers", type=int, default=None, help="parallel fold workers, default: CPU count")
+        parser.add_argument("--no-cache", action="store_true", help="refit every fold instead of reusing cached results")
+
+    def handle(self, *args, **opts):
+        freqs = ("daily", "hourly") if opts["freq"] == "all" else (opts["freq"],)
+        report = run_all(
+            freqs,
+            models=opts["model"],
+            max_folds=opts["max_folds"],
+            workers=opts["workers"],
+            use_cache=not opts["no_cache"],
+        )
+
+        for freq in freqs:
+            res = report[freq]
+            self.stdout.write(f"{freq}: {res['n_obs']} points, {len(res['origins'])} folds")
+            for model, info in res["models"].items():
+                if not info["available"]:
+                    self.stdout.write(f"  {model:<15} unavailable")
+                    continue
+                for h, m in info["horizons"].items():
+                    mape = "n/a" if m["mape"] is None else f"{m['mape']:.2f}%"
+                    self.stdout.write(f"  {model:<15} h={h:<3} MAE={m['mae']:.3f}  MAPE={mape}")
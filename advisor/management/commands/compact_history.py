@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from advisor import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the retention policy to billing_hourly.csv: rows older than the raw window are "
+        "compacted into daily / profile tiers (optionally archived as .csv.gz) and dropped from the raw file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None,
+                            help=f"raw rows to keep, in days back from the newest row (default: {retention.RAW_RETENTION_DAYS})")
+        archive = parser.add_mutually_exclusive_group()
+        archive.add_argument("--archive", dest="archive", action="store_true", default=None)
+        archive.add_argument("--no-archive", dest="archive", action="store_false")
+        parser.add_argument("--dry-run", action="store_true", help="only report what would be compacted")
+
+    def handle(self, *args, **opts):
+        try:
+            summary = retention.apply_retention(opts["days"], archive=opts["archive"], dry_run=opts["dry_run"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if summary["cutoff"] is None:
+            self.stdout.write("billing_hourly.csv has no timestamped rows; nothing to do")
+            return
+        verb = "would compact" if opts["dry_run"] else "compacted"
+        self.stdout.write(
+            f"cutoff {summary['cutoff']}: {verb} {summary['compacted']} rows ({summary['days']} days), "
+            f"{summary['kept']} raw rows kept"
+        )
+        if summary["archive"]:
+            self.stdout.write(f"archived to {summary['archive']}")
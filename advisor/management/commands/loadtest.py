@@ -0,0 +1,181 @@
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test import Client
+from django.urls import reverse
+
+from advisor import storage
+from advisor.models import Budget, Profile
+
+DATA_FILES = [
+    "billing_hourly.csv", "billing_daily.csv", "billing_detailed.csv",
+    "billing_hourly_daily.csv", "billing_hourly_profile.csv", "billing_hourly_tiers.json",
+]
+BROWSE_PAGES = ["advisor:dashboard", "advisor:anomalies_list", "advisor:recommendations_list", "advisor:breakdown", "advisor:budgets"]
+USER_PREFIX = "loadtest_"
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate N logged-in analysts with the dashboard open: each polls /live-update/ "
+        "(as dashboard.html does every 5s), sometimes forces an anomaly and browses other pages. "
+        "Runs in-process through Django's test client (one thread per user) and reports latency "
+        "percentiles, throughput, errors and CSV lock / DB contention. Runs against copies of the "
+        "billing CSVs and a throwaway test database; real data is never written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+        parser.add_argument("--poll-interval", type=float, default=5.0, help="seconds between polls per user (0 = flat out)")
+        parser.add_argument("--force-rate", type=float, default=0.02, help="share of polls that force an anomaly")
+        parser.add_argument("--browse-rate", type=float, default=0.1, help="share of iterations that also open another page")
+        parser.add_argument("--budget", type=float, default=500.0, help="daily all-services budget per simulated user (0 = none)")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **opts):
+        if opts["users"] < 1:
+            raise CommandError("--users must be at least 1")
+
+        # copies of the data files in a scratch directory, served through BILLING_DATA_DIR
+        workdir = Path(tempfile.mkdtemp(prefix="cloudpulse-loadtest-"))
+        source_dir = storage.data_dir()
+        for name in DATA_FILES:
+            if (source_dir / name).exists():
+                shutil.copy2(source_dir / name, workdir / name)
+        settings.BILLING_DATA_DIR = workdir
+        # stay off the real mail server, the shared live buffer of a running server
+        # and the retention policy
+        settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+        mail.outbox = []
+        settings.LIVE_BUFFER_SHM_NAME = None
+        settings.HOURLY_RETENTION_CHECK_SECONDS = None
+
+        # users, profiles and budgets go to a throwaway test database
+        if connection.vendor == "sqlite":
+            # a file rather than the in-memory default, so lock contention is realistic
+            connection.settings_dict.setdefault("TEST", {})["NAME"] = str(workdir / "loadtest.sqlite3")
+        old_db_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._run(opts)
+        finally:
+            connection.creation.destroy_test_db(old_db_name, verbosity=0)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _run(self, opts):
+        rng = random.Random(opts["seed"])
+        host = next((h for h in settings.ALLOWED_HOSTS if h and not h.startswith(".") and h != "*"), "localhost")
+
+        # bulk_create skips the post_save profile signals, so create the profiles explicitly
+        User.objects.bulk_create([
+            User(username=f"{USER_PREFIX}{i}", email="", password="!") for i in range(opts["users"])
+        ])
+        users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by("id"))
+        Profile.objects.bulk_create([Profile(user=u) for u in users])
+        if opts["budget"] > 0:
+            # every ingested row then updates one budget per user, as with real budgets
+            Budget.objects.bulk_create([Budget(user=u, period="daily", amount=opts["budget"]) for u in users])
+
+        latencies = defaultdict(list)
+        statuses = Counter()
+        exceptions = Counter()
+        lock = threading.Lock()
+
+        def on_exception(sender, request=None, **kwargs):
+            exc = sys.exc_info()[1]
+            name = type(exc).__name__ if exc else "unknown"
+            if isinstance(exc, OperationalError) and "locked" in str(exc):
+                name = "DB locked"
+            with lock:
+                exceptions[name] += 1
+
+        got_request_exception.connect(on_exception)
+        storage.LOCK_STATS.update(acquired=0, wait_seconds=0.0, max_wait=0.0)
+
+        live_url = reverse("advisor:live_update")
+        deadline = time.time() + opts["duration"]
+
+        def simulate(user, seed):
+            r = random.Random(seed)
+            client = Client(SERVER_NAME=host, raise_request_exception=False)
+            client.force_login(user)
+            try:
+                # each analyst starts by opening the dashboard, then polls
+                requests = [("dashboard", reverse("advisor:dashboard"))]
+                while time.time() < deadline:
+                    if not requests:
+                        force = r.random() < opts["force_rate"]
+                        requests.append(("live_update+force" if force else "live_update", live_url + ("?force=1" if force else "")))
+                        if r.random() < opts["browse_rate"]:
+                            page = r.choice(BROWSE_PAGES)
+                            requests.append((page.split(":")[1], reverse(page)))
+                    name, url = requests.pop(0)
+                    t0 = time.perf_counter()
+                    try:
+                        status = client.get(url).status_code
+                    except Exception as e:
+                        status = f"client error: {type(e).__name__}"
+                    elapsed = time.perf_counter() - t0
+                    with lock:
+                        latencies[name].append(elapsed)
+                        statuses[status] += 1
+                    if not requests and opts["poll_interval"]:
+                        # jitter so the users don't poll in lockstep
+                        time.sleep(opts["poll_interval"] * r.uniform(0.8, 1.2))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=simulate, args=(u, rng.random())) for u in users]
+        self.stdout.write(f"Running {len(users)} users for {opts['duration']:.0f}s (poll every {opts['poll_interval']}s)...")
+        t_start = time.time()
+        try:
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            wall = time.time() - t_start
+            got_request_exception.disconnect(on_exception)
+
+        self._report(latencies, statuses, exceptions, wall, dict(storage.LOCK_STATS), len(mail.outbox))
+
+    def _report(self, latencies, statuses, exceptions, wall, lock_stats, emails):
+        total = sum(len(v) for v in latencies.values())
+        errors = sum(n for s, n in statuses.items() if not (isinstance(s, int) and s < 400))
+        self.stdout.write("")
+        self.stdout.write(f"{'endpoint':<24}{'requests':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name in sorted(latencies):
+            ms = np.asarray(latencies[name]) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            self.stdout.write(f"{name:<24}{len(ms):>9}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{ms.max():>10.1f}")
+        if total:
+            ms = np.concatenate([np.asarray(v) for v in latencies.values()]) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            self.stdout.write(f"{'ALL':<24}{total:>9}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{ms.max():>10.1f}")
+
+        self.stdout.write("")
+        self.stdout.write(f"throughput: {total / wall if wall else 0:.1f} req/s over {wall:.1f}s")
+        self.stdout.write(f"errors: {errors} ({errors / total * 100 if total else 0:.2f}%)  status codes: {dict(statuses)}")
+        if exceptions:
+            self.stdout.write(f"exceptions: {dict(exceptions)}")
+        acquired = lock_stats["acquired"]
+        self.stdout.write(
+            f"CSV write lock: {acquired} acquisitions, "
+            f"mean wait {lock_stats['wait_seconds'] / acquired * 1000 if acquired else 0:.2f} ms, "
+            f"max wait {lock_stats['max_wait'] * 1000:.2f} ms"
+        )
+        self.stdout.write(f"DB lock errors: {exceptions.get('DB locked', 0)}   alert emails (not sent): {emails}")
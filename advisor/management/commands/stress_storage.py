@@ -0,0 +1,100 @@
+import multiprocessing as mp
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from advisor import storage
+
+COLUMNS = ["timestamp", "date", "hour", "service", "category", "cost"]
+
+
+def _writer(path, writer_id, appends):
+    for i in range(appends):
+        storage.append_rows(path, [{
+            "timestamp": "2099-01-01 00:00:00",
+            "service": f"W{writer_id}",
+            "category": f"row{i}",
+            "cost": 1.0,
+        }])
+
+
+def _reader(path, running, errors, torn_before):
+    last = 0
+    while running.value:
+        try:
+            df = storage.read_csv(path)
+        except Exception as e:
+            errors.put(f"read failed: {e!r}")
+            return
+        if list(df.columns) != COLUMNS:
+            errors.put(f"bad header: {list(df.columns)}")
+        elif df["cost"].isna().sum() > torn_before:
+            errors.put("row with missing cost (torn line)")
+        if len(df) < last:
+            errors.put(f"row count went backwards: {last} -> {len(df)}")
+        last = len(df)
+
+
+class Command(BaseCommand):
+    help = "Run concurrent reader/writer processes against a copy of billing_hourly.csv and check no rows are lost or torn."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--appends", type=int, default=50, help="rows appended per writer")
+        parser.add_argument("--source", default=str(Path(storage.__file__).parent / "billing_hourly.csv"),
+                            help="CSV copied as the starting file (the original is never touched)")
+
+    def handle(self, *args, **opts):
+        workdir = Path(tempfile.mkdtemp(prefix="cloudpulse-stress-"))
+        path = workdir / "billing_hourly.csv"
+        try:
+            shutil.copyfile(opts["source"], path)
+            start = storage.read_csv(path)
+            start_rows = len(start)
+            # rows already broken in the source file don't count against this run
+            torn_before = int(start["cost"].isna().sum())
+
+            errors = mp.Queue()
+            running = mp.Value("b", 1)
+            writers = [mp.Process(target=_writer, args=(path, w, opts["appends"])) for w in range(opts["writers"])]
+            readers = [mp.Process(target=_reader, args=(path, running, errors, torn_before)) for _ in range(opts["readers"])]
+
+            t0 = time.time()
+            for p in readers + writers:
+                p.start()
+            for p in writers:
+                p.join()
+            running.value = 0
+            for p in readers:
+                p.join()
+            elapsed = time.time() - t0
+
+            problems = []
+            while not errors.empty():
+                problems.append(errors.get())
+            problems += [f"process exited with {p.exitcode}" for p in readers + writers if p.exitcode]
+
+            df = storage.read_csv(path)
+            expected = start_rows + opts["writers"] * opts["appends"]
+            if len(df) != expected:
+                problems.append(f"expected {expected} rows, found {len(df)}")
+            for w in range(opts["writers"]):
+                missing = opts["appends"] - df.loc[df["service"] == f"W{w}", "category"].nunique()
+                if missing:
+                    problems.append(f"writer {w} lost {missing} rows")
+
+            self.stdout.write(
+                f"{opts['writers']} writers x {opts['appends']} appends, {opts['readers']} readers: "
+                f"{elapsed:.2f}s, {len(df)} rows, version {storage.data_version(path)}"
+            )
+            if problems:
+                for p in problems[:20]:
+                    self.stderr.write(p)
+                raise CommandError(f"{len(problems)} problem(s) found")
+            self.stdout.write(self.style.SUCCESS("OK: no read errors, no lost or torn rows"))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisor', '0002_alter_profile_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service', models.CharField(blank=True, default='', max_length=64)),
+                ('period', models.CharField(choices=[('monthly', 'Monthly'), ('daily', 'Daily')], default='monthly', max_length=16)),
+                ('amount', models.FloatField()),
+                ('period_start', models.DateTimeField(blank=True, null=True)),
+                ('spent', models.FloatField(default=0.0)),
+                ('last_spend_at', models.DateTimeField(blank=True, null=True)),
+                ('alert_level', models.CharField(blank=True, default='', max_length=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
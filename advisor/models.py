@@ -1,4 +1,6 @@
 # advisor/models.py
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
@@ -17,6 +19,49 @@ class Profile(models.Model):
     def __str__(self):
         return f"Profile({self.user.username})"
 
+class Budget(models.Model):
+    PERIOD_CHOICES = [("monthly", "Monthly"), ("daily", "Daily")]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="budgets")
+    # blank = all services
+    service = models.CharField(max_length=64, blank=True, default="")
+    period = models.CharField(max_length=16, choices=PERIOD_CHOICES, default="monthly")
+    amount = models.FloatField()
+
+    # running state for the current period, updated on every ingested row (see advisor/budgets.py)
+    period_start = models.DateTimeField(null=True, blank=True)
+    spent = models.FloatField(default=0.0)
+    last_spend_at = models.DateTimeField(null=True, blank=True)
+    # highest alert already sent this period: "", "forecast" or "breach"
+    alert_level = models.CharField(max_length=16, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def period_bounds(self, when):
+        """(start, end) of the budget period containing `when`."""
+        if self.period == "daily":
+            start = when.replace(hour=0, minute=0, second=0, microsecond=0)
+            return start, start + timedelta(days=1)
+        start = when.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        return start, (start + timedelta(days=32)).replace(day=1)
+
+    def projected(self, when=None):
+        """Spend at the end of the period if the current burn rate holds."""
+        when = when or self.last_spend_at
+        if not when or not self.period_start:
+            return self.spent
+        start, end = self.period_bounds(when)
+        elapsed = (when - start).total_seconds()
+        if elapsed <= 0:
+            return self.spent
+        return self.spent * (end - start).total_seconds() / elapsed
+
+    @property
+    def used_pct(self):
+        return round(self.spent / self.amount * 100, 1) if self.amount else 0.0
+
+    def __str__(self):
+        return f"Budget({self.user.username}, {self.service or 'all'}, {self.period}, {self.amount})"
+
 @receiver(post_save, sender=User)
 def ensure_profile(sender, instance, created, **kwargs):
     if created:
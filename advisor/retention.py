@@ -0,0 +1,213 @@
+# advisor/retention.py
+"""
+Retention and tiering of billing_hourly.csv.
+
+Raw hourly rows are kept for the last RAW_RETENTION_DAYS days (counted back from
+the newest row). Older rows are compacted, whole days at a time, into two tiers:
+
+  billing_hourly_daily.csv    date / service / category totals (cost breakdown, budgets)
+  billing_hourly_profile.csv  count / sum / sumsq per (service, weekday, hour), plus
+                              rsum / rsumsq of costs relative to their day's mean
+                              (anomaly baselines, hourly forecast profile)
+
+and, optionally, archived as-is to archive/*.csv.gz next to the CSVs. A small manifest records
+the compaction watermark; readers ignore raw rows below it, so a reader that sees the
+new tiers next to the not-yet-rewritten raw file never counts a row twice.
+"""
+import gzip
+import json
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+
+from advisor import storage
+
+HOURLY_FILE = "billing_hourly.csv"
+DAILY_TIER_FILE = "billing_hourly_daily.csv"
+PROFILE_TIER_FILE = "billing_hourly_profile.csv"
+MANIFEST_FILE = "billing_hourly_tiers.json"
+ARCHIVE_DIR = "archive"
+
+RAW_RETENTION_DAYS = getattr(settings, "HOURLY_RAW_RETENTION_DAYS", 90)
+ARCHIVE_COLD_DATA = getattr(settings, "HOURLY_ARCHIVE_COLD_DATA", True)
+# the live window (live_buffer.WINDOW_HOURS) must stay in the raw tier
+MIN_RETENTION_DAYS = 3
+
+# what the generator and live ingestion write; anything else (torn lines) stays raw
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DAILY_COLUMNS = ["date", "service", "category", "cost", "rows"]
+PROFILE_KEYS = ["service", "weekday", "hour"]
+PROFILE_COLUMNS = PROFILE_KEYS + ["count", "sum", "sumsq", "rsum", "rsumsq"]
+
+_last_check = 0.0
+_check_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------
+# Reading the tiers
+# ---------------------------------------------------------------
+def load_manifest():
+    try:
+        return json.loads(storage.data_path(MANIFEST_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def compacted_before():
+    """Midnight below which hourly rows live in the compacted tiers (None: nothing compacted)."""
+    value = load_manifest().get("compacted_before")
+    return pd.Timestamp(value) if value else None
+
+
+def read_raw_hourly(**kwargs):
+    """billing_hourly.csv without rows that were already compacted (same arguments as read_csv)."""
+    path = storage.data_path(HOURLY_FILE)
+    if not path.exists():
+        return pd.DataFrame(columns=kwargs.get("usecols") or ["timestamp", "service", "cost"])
+    df = storage.read_csv(path, **kwargs)
+    watermark = compacted_before()
+    if watermark is not None and not df.empty:
+        ts = pd.to_datetime(df["timestamp"], format=TIMESTAMP_FORMAT, errors="coerce")
+        df = df[~(ts < watermark)].reset_index(drop=True)
+    return df
+
+
+def load_daily_tier():
+    path = storage.data_path(DAILY_TIER_FILE)
+    if not path.exists():
+        return pd.DataFrame(columns=DAILY_COLUMNS)
+    return storage.read_csv(path)
+
+
+def load_profile_tier():
+    """Compacted profile stats indexed by (service, weekday, hour), like forecast_hourly.profile_stats."""
+    path = storage.data_path(PROFILE_TIER_FILE)
+    if not path.exists():
+        return pd.DataFrame(columns=PROFILE_COLUMNS).set_index(PROFILE_KEYS)
+    tier = storage.read_csv(path)
+    for col in ("rsum", "rsumsq"):
+        if col not in tier.columns:  # written before the per-day ratios: counts as a flat profile
+            tier[col] = tier["count"]
+    return tier.set_index(PROFILE_KEYS)[PROFILE_COLUMNS[len(PROFILE_KEYS):]]
+
+
+def add_stats(*frames):
+    """Sum profile stat frames that share the (service, weekday, hour) index."""
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=PROFILE_COLUMNS).set_index(PROFILE_KEYS)
+    return pd.concat(frames).groupby(level=PROFILE_KEYS).sum()
+
+
+# ---------------------------------------------------------------
+# Compaction
+# ---------------------------------------------------------------
+def _daily_totals(old, ts):
+    category = old["category"] if "category" in old.columns else pd.Series(None, index=old.index, dtype=object)
+    df = pd.DataFrame({
+        "date": ts.dt.strftime("%Y-%m-%d"),
+        "service": old["service"],
+        "category": category,
+        "cost": old["cost"],
+        "rows": 1,
+    })
+    return df.groupby(["date", "service", "category"], as_index=False, dropna=False)[["cost", "rows"]].sum()
+
+
+def _merge_daily(new):
+    merged = pd.concat([load_daily_tier(), new], ignore_index=True)
+    merged = merged.groupby(["date", "service", "category"], as_index=False, dropna=False)[["cost", "rows"]].sum()
+    storage.atomic_write_csv(merged.sort_values(["date", "service"])[DAILY_COLUMNS], storage.data_path(DAILY_TIER_FILE))
+
+
+def _merge_profile(new):
+    merged = add_stats(load_profile_tier(), new)
+    storage.atomic_write_csv(merged.reset_index()[PROFILE_COLUMNS], storage.data_path(PROFILE_TIER_FILE))
+
+
+def _archive(old, ts):
+    archive_dir = storage.data_path(ARCHIVE_DIR)
+    archive_dir.mkdir(exist_ok=True)
+    path = archive_dir / f"billing_hourly_{ts.min():%Y%m%d}_{ts.max():%Y%m%d}.csv.gz"
+    storage.atomic_write_bytes(path, gzip.compress(old.to_csv(index=False).encode()))
+    return path
+
+
+def apply_retention(retention_days=None, archive=None, dry_run=False):
+    """
+    Compact raw hourly rows older than `retention_days` (default RAW_RETENTION_DAYS)
+    into the daily and profile tiers, archive them if `archive` (default ARCHIVE_COLD_DATA),
+    then drop them from billing_hourly.csv. Runs under the billing_hourly.csv writer lock,
+    so live appends wait instead of being lost. Returns a summary dict.
+    """
+    # imported here: forecast_hourly reads the tiers through this module
+    from advisor.forecast_hourly import profile_stats
+
+    days = getattr(settings, "HOURLY_RAW_RETENTION_DAYS", RAW_RETENTION_DAYS) if retention_days is None else retention_days
+    if days < MIN_RETENTION_DAYS:
+        raise ValueError(f"retention must keep at least {MIN_RETENTION_DAYS} days of raw rows")
+    archive = getattr(settings, "HOURLY_ARCHIVE_COLD_DATA", ARCHIVE_COLD_DATA) if archive is None else archive
+    summary = {"cutoff": None, "compacted": 0, "kept": 0, "days": 0, "archive": None}
+
+    def compact(df):
+        ts = pd.to_datetime(df["timestamp"], format=TIMESTAMP_FORMAT, errors="coerce")
+        if ts.isna().all():
+            summary["kept"] = len(df)
+            return None
+        previous = compacted_before()
+        cutoff = (ts.max() - pd.Timedelta(days=days)).normalize()
+        if previous is not None:
+            cutoff = max(cutoff, previous)
+        cold = (ts < cutoff).to_numpy()  # rows without a timestamp stay raw
+        # rows below an earlier watermark were already folded in by a run that died before the rewrite
+        fresh = cold & ~(ts < previous).to_numpy() if previous is not None else cold
+        old, old_ts = df[fresh], ts[fresh]
+        summary.update(cutoff=str(cutoff.date()), compacted=int(fresh.sum()), kept=int((~cold).sum()),
+                       days=int(old_ts.dt.normalize().nunique()))
+        if not cold.any() or dry_run:
+            return None
+
+        if len(old):
+            _merge_daily(_daily_totals(old, old_ts))
+            _merge_profile(profile_stats(old))
+            if archive:
+                summary["archive"] = str(_archive(old, old_ts))
+        manifest = load_manifest()
+        manifest.update(compacted_before=str(cutoff.date()), updated=time.strftime("%Y-%m-%d %H:%M:%S"))
+        if summary["archive"]:
+            manifest.setdefault("archives", []).append(Path(summary["archive"]).name)
+        storage.atomic_write_text(storage.data_path(MANIFEST_FILE), json.dumps(manifest, indent=2))
+        return df[~cold]
+
+    path = storage.data_path(HOURLY_FILE)
+    if path.exists():
+        storage.rewrite_csv(path, compact)
+    return summary
+
+
+def maybe_apply_retention():
+    """
+    Called on ingestion. Off by default (run `manage.py compact_history` from a scheduled
+    job instead); with HOURLY_RETENTION_CHECK_SECONDS set, starts the policy in a background
+    thread at most that often per process, so no request waits on the compaction.
+    Returns the started thread, or None.
+    """
+    global _last_check
+    interval = getattr(settings, "HOURLY_RETENTION_CHECK_SECONDS", None)
+    with _check_lock:
+        if interval is None or time.time() - _last_check < interval:
+            return None
+        _last_check = time.time()
+
+    def run():
+        try:
+            apply_retention()
+        except Exception as e:
+            print("Hourly retention failed:", e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
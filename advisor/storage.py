@@ -0,0 +1,238 @@
+# advisor/storage.py
+"""
+Concurrency-safe access to the billing CSVs.
+
+Writers take an exclusive cross-process lock on a side file, write the new
+content to a temp file in the same directory and os.replace() it over the
+original. Readers never lock: whatever file they open is a complete snapshot,
+old or new, never a half-written one.
+
+Every CSV write also bumps a small per-file version counter (data_version) that
+caches can use as part of their keys.
+
+The billing CSVs live in settings.BILLING_DATA_DIR (default: the advisor/ package);
+resolve them with data_path() at call time so the directory can be swapped.
+"""
+import csv
+import os
+import shutil
+import stat
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+ADVISOR_DIR = Path(__file__).resolve().parent
+
+
+def data_dir():
+    """Directory holding the billing CSVs."""
+    from django.conf import settings
+    from django.core.exceptions import ImproperlyConfigured
+    try:
+        configured = getattr(settings, "BILLING_DATA_DIR", None)
+    except ImproperlyConfigured:  # used outside a Django process
+        configured = None
+    return Path(configured or ADVISOR_DIR)
+
+
+def data_path(name):
+    return data_dir() / name
+
+
+def _side_file(path, suffix):
+    path = Path(path)
+    return path.with_name(f".{path.name}.{suffix}")
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """
+    Cross-process lock on `path` (the lock file itself, created if missing).
+    shared=True allows concurrent holders where the platform supports it.
+    """
+    with open(path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+        else:
+            # msvcrt has no shared locks; LK_LOCK retries for ~10s before raising
+            while True:
+                try:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# writer lock contention in this process (read by the loadtest command)
+LOCK_STATS = {"acquired": 0, "wait_seconds": 0.0, "max_wait": 0.0}
+
+
+@contextmanager
+def write_lock(path):
+    """Exclusive writer lock for a data file."""
+    t0 = time.perf_counter()
+    with file_lock(_side_file(path, "lock")):
+        waited = time.perf_counter() - t0
+        LOCK_STATS["acquired"] += 1
+        LOCK_STATS["wait_seconds"] += waited
+        LOCK_STATS["max_wait"] = max(LOCK_STATS["max_wait"], waited)
+        yield
+
+
+def data_version(path):
+    """Number of completed writes to `path` through this module (0 if never written)."""
+    try:
+        return int(_side_file(path, "version").read_text() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _bump_version(path):
+    # caller holds the write lock; the data file is already replaced, so a reader
+    # that sees the new version always reads the new data
+    version = data_version(path) + 1
+    _replace_with(_side_file(path, "version"), lambda fh: fh.write(str(version).encode()))
+    return version
+
+
+def _replace(src, dst):
+    # on Windows os.replace fails while a reader has dst open; retry briefly
+    for attempt in range(50):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == 49:
+                raise
+            time.sleep(0.02)
+
+
+def _replace_with(path, fill):
+    """Write via fill(binary file handle) into a temp file next to `path`, then swap it in."""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        # mkstemp creates 0600 files; keep the permissions the file had before
+        os.chmod(tmp, stat.S_IMODE(path.stat().st_mode) if path.exists() else 0o644)
+        with os.fdopen(fd, "wb") as fh:
+            fill(fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        _replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_bytes(path, data):
+    """Replace `path` with `data` in one step (no lock/version; for caches, reports and archives)."""
+    _replace_with(path, lambda fh: fh.write(data))
+
+
+def atomic_write_text(path, text):
+    atomic_write_bytes(path, text.encode())
+
+
+def atomic_write_csv(df, path, **kwargs):
+    """Replace `path` with df.to_csv(); readers see either the old or the new file."""
+    kwargs.setdefault("index", False)
+    with write_lock(path):
+        _replace_with(path, lambda fh: fh.write(df.to_csv(**kwargs).encode()))
+        return _bump_version(path)
+
+
+def rewrite_csv(path, transform, **write_kwargs):
+    """
+    Read-modify-write under the writer lock: transform(df) returns the new frame
+    (or None to leave the file alone). Appends can't slip in between read and write.
+    """
+    write_kwargs.setdefault("index", False)
+    with write_lock(path):
+        new_df = transform(read_csv(path))
+        if new_df is None:
+            return data_version(path)
+        _replace_with(path, lambda fh: fh.write(new_df.to_csv(**write_kwargs).encode()))
+        return _bump_version(path)
+
+
+def append_rows(path, rows, columns=None, on_written=None):
+    """
+    Append dict rows to a CSV. The existing bytes are copied unchanged into the
+    new file, so the result is exactly the old file plus the new lines.
+    Missing columns are written empty; the file is created with `columns` if absent.
+    `on_written()` runs after the replace, still under the writer lock, so anything
+    that reads the file under that lock sees the rows and the callback's effect together.
+    """
+    path = Path(path)
+    with write_lock(path):
+        header = None
+        if path.exists():
+            with open(path, newline="") as fh:
+                header = next(csv.reader(fh), None)
+        if not header:
+            header = list(columns or rows[0].keys())
+
+        def fill(fh):
+            if path.exists() and path.stat().st_size:
+                with open(path, "rb") as src:
+                    shutil.copyfileobj(src, fh)
+                    src.seek(-1, os.SEEK_END)
+                    if src.read(1) != b"\n":
+                        fh.write(b"\n")
+            else:
+                fh.write((",".join(header) + "\n").encode())
+            lines = []
+            for row in rows:
+                lines.append(",".join(_csv_field(row.get(col, "")) for col in header))
+            fh.write(("\n".join(lines) + "\n").encode())
+
+        _replace_with(path, fill)
+        version = _bump_version(path)
+        if on_written is not None:
+            on_written()
+        return version
+
+
+def _csv_field(value):
+    text = "" if value is None else str(value)
+    if any(ch in text for ch in ',"\n\r'):
+        text = '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def replace_file(path, src):
+    """Swap in a copy of `src` as `path` (same locking/versioning as the other writers)."""
+    with write_lock(path):
+        def fill(fh):
+            with open(src, "rb") as source:
+                shutil.copyfileobj(source, fh)
+        _replace_with(path, fill)
+        return _bump_version(path)
+
+
+def read_csv(path, **kwargs):
+    """pd.read_csv on a consistent snapshot of `path` (no lock needed, see module docstring)."""
+    return pd.read_csv(path, **kwargs)
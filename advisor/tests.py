@@ -1,3 +1,610 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from advisor import backtesting, budgets, fastjson, forecast_hourly, live_buffer, retention, storage, views
+from advisor.cost_breakdown import BreakdownStore, CostAggregates
+from advisor.dashboard_cache import cache_stats
+from advisor.forecast_model import load_daily_series
+from advisor.live_buffer import HourlyRingBuffer
+from advisor.models import Budget, Profile
+
+SERVICES = ["EC2", "RDS", "S3", "CloudFront"]
+
+
+def _window(per_service):
+    """costs matrix (one column per service + total) from a slots x services array."""
+    per_service = np.asarray(per_service, dtype=float)
+    return np.column_stack([per_service, per_service.sum(axis=1)])
+
+
+class StorageTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.path = self.dir / "billing_hourly.csv"
+
+    def test_append_keeps_existing_bytes_and_bumps_the_version(self):
+        self.path.write_bytes(b"timestamp,service,category,cost\n2025-01-01 00:00:00,EC2,Compute,1.5")  # no final newline
+        self.assertEqual(storage.data_version(self.path), 0)
+
+        version = storage.append_rows(self.path, [{"timestamp": "2025-01-01 01:00:00", "service": "S3", "cost": 2}])
+        self.assertEqual(version, 1)
+        self.assertEqual(storage.data_version(self.path), 1)
+        self.assertEqual(
+            self.path.read_bytes(),
+            b"timestamp,service,category,cost\n2025-01-01 00:00:00,EC2,Compute,1.5\n2025-01-01 01:00:00,S3,,2\n",
+        )
+
+    def test_append_creates_the_file_and_quotes_fields(self):
+        storage.append_rows(self.path, [{"service": 'a,"b"', "cost": 1}], columns=["timestamp", "service", "cost"])
+        df = storage.read_csv(self.path)
+        self.assertEqual(list(df.columns), ["timestamp", "service", "cost"])
+        self.assertEqual(df.loc[0, "service"], 'a,"b"')
+
+    def test_concurrent_appends_lose_no_rows(self):
+        self.path.write_text("timestamp,service,cost\n")
+
+        def writer(w):
+            for i in range(20):
+                storage.append_rows(self.path, [{"timestamp": "2025-01-01 00:00:00", "service": f"W{w}", "cost": i}])
+
+        threads = [threading.Thread(target=writer, args=(w,)) for w in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        df = storage.read_csv(self.path)
+        self.assertEqual(len(df), 80)
+        self.assertEqual(df.groupby("service")["cost"].nunique().to_dict(), {f"W{w}": 20 for w in range(4)})
+        self.assertEqual(storage.data_version(self.path), 80)
+
+    def test_writers_wait_for_the_write_lock(self):
+        self.path.write_text("timestamp,service,cost\n")
+        held, appended = threading.Event(), threading.Event()
+
+        def append():
+            storage.append_rows(self.path, [{"timestamp": "t", "service": "EC2", "cost": 1}])
+            appended.set()
+
+        with storage.write_lock(self.path):
+            thread = threading.Thread(target=append)
+            thread.start()
+            self.assertFalse(appended.wait(0.3))
+            self.assertEqual(self.path.read_text(), "timestamp,service,cost\n")
+        thread.join(5)
+        self.assertTrue(appended.is_set())
+        self.assertEqual(len(storage.read_csv(self.path)), 1)
+
+    def test_failed_write_leaves_the_old_file_and_no_temp_files(self):
+        self.path.write_text("timestamp,service,cost\n")
+        os.chmod(self.path, 0o640)
+
+        def failing_transform(df):
+            raise RuntimeError("transform failed")
+
+        def partial_write(fh):
+            fh.write(b"partial")
+            raise OSError("disk full")
+
+        with self.assertRaises(RuntimeError):
+            storage.rewrite_csv(self.path, failing_transform)
+        with self.assertRaises(OSError):
+            storage._replace_with(self.path, partial_write)
+        self.assertEqual(self.path.read_text(), "timestamp,service,cost\n")
+        self.assertEqual(sorted(p.name for p in self.dir.iterdir() if p.suffix == ".tmp"), [])
+
+        storage.atomic_write_csv(pd.DataFrame({"timestamp": ["t"], "service": ["EC2"], "cost": [1.0]}), self.path)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+        self.assertEqual(storage.data_version(self.path), 1)
+
+    def test_rewrite_without_changes_keeps_file_and_version(self):
+        self.path.write_text("timestamp,service,cost\nt,EC2,1\n")
+        mtime = self.path.stat().st_mtime_ns
+        self.assertEqual(storage.rewrite_csv(self.path, lambda df: None), 0)
+        self.assertEqual(self.path.stat().st_mtime_ns, mtime)
+        self.assertEqual(storage.rewrite_csv(self.path, lambda df: df[df["cost"] > 5]), 1)
+        self.assertEqual(self.path.read_text(), "timestamp,service,cost\n")
+
+
+def _days(start, n):
+    return pd.date_range(start, periods=n, freq="D")
+
+
+class CostAggregatesTests(SimpleTestCase):
+    def setUp(self):
+        self.agg = CostAggregates()
+        days = _days("2025-01-01", 20)  # a wednesday
+        self.agg.add_frame(pd.DataFrame({
+            "date": list(days) * 2,
+            "service": ["EC2"] * 20 + ["S3"] * 20,
+            "category": ["Compute"] * 20 + [None] * 20,  # S3 falls back to the generator's category
+            "cost": [1.0] * 20 + [float(d.day) for d in days],
+        }))
+
+    def test_range_totals_are_inclusive(self):
+        totals = self.agg.range_totals(np.datetime64("2025-01-03"), np.datetime64("2025-01-05"))
+        self.assertEqual(list(totals), [3.0, 12.0])
+        self.assertEqual(list(self.agg.range_totals(np.datetime64("2025-01-01"), np.datetime64("2025-01-01"))), [1.0, 1.0])
+        self.assertEqual(list(self.agg.range_totals(np.datetime64("2025-02-01"), np.datetime64("2025-02-10"))), [0.0, 0.0])
+
+    def test_rows_for_earlier_days_and_new_services_update_the_prefix_sums(self):
+        self.agg.add_frame(pd.DataFrame({"date": [pd.Timestamp("2025-01-02"), pd.Timestamp("2024-12-31")],
+                                         "service": ["EC2", "Lambda"], "category": [None, None], "cost": [5.0, 2.0]}))
+        self.assertEqual(self.agg.first_date, np.datetime64("2024-12-31"))
+        self.assertEqual(list(self.agg.range_totals(np.datetime64("2024-12-31"), np.datetime64("2025-01-03"))), [8.0, 6.0, 2.0])
+        self.assertEqual(list(self.agg.range_totals(np.datetime64("2025-01-03"), np.datetime64("2025-01-20"))), [18.0, 207.0, 0.0])
+
+    def test_week_buckets_start_on_monday(self):
+        labels, matrix = self.agg.period_totals(np.datetime64("2025-01-01"), np.datetime64("2025-01-20"), "week")
+        self.assertEqual(labels, ["2024-12-30", "2025-01-06", "2025-01-13", "2025-01-20"])
+        self.assertEqual(list(matrix[:, 0]), [5.0, 7.0, 7.0, 1.0])
+        self.assertEqual(matrix[:, 1].sum(), sum(range(1, 21)))
+
+    def test_month_and_day_buckets(self):
+        self.agg.add_frame(pd.DataFrame({"date": _days("2025-01-30", 4), "service": "EC2", "category": "Compute", "cost": 10.0}))
+        labels, matrix = self.agg.period_totals(np.datetime64("2025-01-19"), np.datetime64("2025-02-02"), "month")
+        self.assertEqual(labels, ["2025-01-01", "2025-02-01"])
+        self.assertEqual(list(matrix[:, 0]), [2.0 + 20.0, 20.0])
+        labels, matrix = self.agg.period_totals(np.datetime64("2025-01-19"), np.datetime64("2025-01-20"), "day")
+        self.assertEqual(labels, ["2025-01-19", "2025-01-20"])
+        self.assertEqual(list(matrix[:, 1]), [19.0, 20.0])
+
+    def test_group_by_category(self):
+        labels, totals = self.agg.group_columns(self.agg.range_totals(np.datetime64("2025-01-01"), np.datetime64("2025-01-02")), "category")
+        self.assertEqual(labels, ["Compute", "Storage"])
+        self.assertEqual(list(totals), [2.0, 3.0])
+
+
+class BreakdownStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        settings = override_settings(BILLING_DATA_DIR=self.dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        pd.DataFrame({"date": ["2025-01-01", "2025-01-01", "2025-01-02"], "service": ["EC2", "S3", "EC2"],
+                      "category": ["Compute", "Storage", "Compute"], "daily_cost": [10.0, 5.0, 10.0]}
+                     ).to_csv(self.dir / "billing_detailed.csv", index=False)
+        # the first hourly row repeats a day billing_detailed.csv already covers
+        self.hourly = self.dir / "billing_hourly.csv"
+        self.hourly.write_text("timestamp,service,cost\n2025-01-02 10:00:00,EC2,99\n2025-01-03 10:00:00,EC2,1.5\n")
+        self.store = BreakdownStore()
+
+    def totals(self):
+        return self.store.breakdown("t", "2025-01-01", "2025-01-10")["totals"]
+
+    def test_seed_uses_detailed_then_newer_hourly_rows(self):
+        self.assertEqual(self.totals(), {"EC2": 21.5, "S3": 5.0})
+
+    def test_appended_rows_are_folded_in_incrementally(self):
+        self.totals()
+        storage.append_rows(self.hourly, [{"timestamp": "2025-01-04 00:00:00", "service": "S3", "cost": 2}])
+        self.assertEqual(self.totals(), {"EC2": 21.5, "S3": 7.0})
+        self.assertEqual(self.store.breakdown("t", "2025-01-04", "2025-01-04", period="day")["series"]["values"]["S3"], [2.0])
+
+    def test_rewritten_file_is_reseeded(self):
+        self.totals()
+        self.hourly.write_text("timestamp,service,cost\n2025-01-05 10:00:00,RDS,4\n")
+        self.assertEqual(self.totals(), {"EC2": 20.0, "RDS": 4.0, "S3": 5.0})
+
+
+def _hour(h):
+    return f"2025-01-01 {h:02d}:00:00"
+
+
+class HourlyRingBufferTests(SimpleTestCase):
+    def setUp(self):
+        self.buf = HourlyRingBuffer(capacity=4, services=["EC2", "S3"])
+
+    def test_wraps_around_keeping_the_newest_slots_in_order(self):
+        for h in range(6):
+            self.buf.push(_hour(h), "EC2", h)
+        epochs, totals = self.buf.totals()
+        self.assertEqual(len(self.buf), 4)
+        self.assertEqual(list(totals), [2.0, 3.0, 4.0, 5.0])
+        self.assertTrue(np.all(np.diff(epochs) == 3600))
+        self.assertEqual(list(self.buf.totals(2)[1]), [4.0, 5.0])
+
+    def test_rows_sharing_a_timestamp_are_summed_per_service(self):
+        self.buf.push(_hour(1), "EC2", 2.0)
+        self.buf.push(_hour(1), "S3", 3.0)
+        self.buf.push(_hour(1), "Lambda", 1.0)  # not a column of its own, still in the total
+        epochs, costs = self.buf.snapshot()
+        self.assertEqual(len(epochs), 1)
+        self.assertEqual(list(costs[0]), [2.0, 3.0, 6.0])
+
+    def test_late_row_is_placed_in_time_order(self):
+        for h in (1, 2, 4):
+            self.buf.push(_hour(h), "EC2", 1.0)
+        self.assertTrue(self.buf.push(_hour(3), "S3", 5.0))
+        self.assertTrue(self.buf.push(_hour(2), "S3", 1.0))
+        epochs, costs = self.buf.snapshot()
+        self.assertTrue(np.all(np.diff(epochs) == 3600))
+        self.assertEqual(list(costs[:, -1]), [1.0, 2.0, 5.0, 1.0])
+
+    def test_late_row_in_a_full_window_drops_the_oldest_slot(self):
+        for h in (0, 1, 3, 4):
+            self.buf.push(_hour(h), "EC2", 1.0)
+        self.assertTrue(self.buf.push(_hour(2), "EC2", 7.0))
+        self.assertFalse(self.buf.push(_hour(0), "EC2", 1.0))  # now older than the window
+        epochs, totals = self.buf.totals()
+        self.assertTrue(np.all(np.diff(epochs) == 3600))
+        self.assertEqual(list(totals), [1.0, 7.0, 1.0, 1.0])
+
+
+
+class LiveIngestTests(TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        settings = override_settings(BILLING_DATA_DIR=self.dir, LIVE_BUFFER_SHM_NAME=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        previous, live_buffer._buffer = live_buffer._buffer, None
+        self.addCleanup(setattr, live_buffer, "_buffer", previous)
+        earlier = (datetime.now() - timedelta(hours=1)).strftime(retention.TIMESTAMP_FORMAT)
+        storage.append_rows(self.dir / "billing_hourly.csv", [{"timestamp": earlier, "service": "EC2", "cost": 10.0}])
+
+    def test_first_ingest_of_a_process_counts_the_row_once(self):
+        row = views.append_one_live_hour()
+        _, totals = live_buffer.get_live_buffer().totals()
+        self.assertAlmostEqual(totals.sum(), 10.0 + row["cost"])
+
+        # a buffer seeded afterwards (another worker) reads the same totals from the CSV
+        other = HourlyRingBuffer()
+        live_buffer.seed_from_csv(other)
+        self.assertAlmostEqual(other.totals()[1].sum(), 10.0 + row["cost"])
+
+class HourlyForecastTests(SimpleTestCase):
+    def flat_profiles(self):
+        return forecast_hourly.fit_profiles(forecast_hourly.profile_stats(
+            pd.DataFrame(columns=["timestamp", "service", "cost"])), SERVICES)
+
+    def test_flat_hourly_series_forecasts_its_level(self):
+        epochs = 1_700_000_000 + np.arange(24) * 3600
+        costs = _window(np.full((24, 4), 5.0))
+        future, yhat, lower, upper = forecast_hourly.forecast_from_profiles(self.flat_profiles(), SERVICES, epochs, costs, 12)
+
+        np.testing.assert_allclose(yhat, 20.0)
+        np.testing.assert_array_equal(np.diff(future), 3600)
+        self.assertEqual(future[0], epochs[-1] + 3600)
+        self.assertTrue(np.all(lower <= yhat) and np.all(upper >= yhat))
+
+    def test_single_service_slots_forecast_the_total_not_a_share(self):
+        # live ticks: ~60s apart, every slot holds one service's cost
+        epochs = 1_700_000_000 + np.arange(24) * 60
+        per_service = np.zeros((24, 4))
+        per_service[np.arange(24), np.arange(24) % 4] = 17.0
+        future, yhat, lower, upper = forecast_hourly.forecast_from_profiles(
+            self.flat_profiles(), SERVICES, epochs, _window(per_service), 12)
+
+        np.testing.assert_allclose(yhat, 17.0)
+        np.testing.assert_array_equal(np.diff(future), 60)
+
+    def test_steady_seasonal_series_follows_the_profile(self):
+        # history where every service costs twice as much at hour 12 as at any other hour
+        ts = pd.date_range("2024-01-01", periods=24 * 28, freq="h")
+        rows = [(t, svc, 20.0 if t.hour == 12 else 10.0) for t in ts for svc in SERVICES]
+        profiles = forecast_hourly.fit_profiles(
+            forecast_hourly.profile_stats(pd.DataFrame(rows, columns=["timestamp", "service", "cost"])), SERVICES)
+
+        epochs = ts[-24:].values.astype("datetime64[s]").astype(np.int64)
+        per_service = np.array([[20.0 if t.hour == 12 else 10.0] * 4 for t in ts[-24:]])
+        future, yhat, _, _ = forecast_hourly.forecast_from_profiles(profiles, SERVICES, epochs, _window(per_service), 24)
+
+        hours = (future // 3600) % 24
+        np.testing.assert_allclose(yhat[hours == 12], 80.0, rtol=1e-6)
+        np.testing.assert_allclose(yhat[hours != 12], 40.0, rtol=1e-6)
+
+    def test_window_spanning_slots_with_different_factors_keeps_its_level(self):
+        # four weeks of history, then live ticks 60s apart at nine times that scale;
+        # the ticks span hour 10 (half the day's mean) and hour 11 (1.5x the day's mean)
+        def cost(t):
+            return {10: 1.0, 11: 3.0}.get(t.hour, 2.0)
+
+        ts = pd.date_range("2024-01-01", periods=24 * 28, freq="h")
+        live = pd.date_range("2024-01-29 10:48", periods=24, freq="min")
+        rows = [(t, svc, cost(t)) for t in ts for svc in SERVICES] + [(t, svc, 9 * cost(t)) for t in live for svc in SERVICES]
+        profiles = forecast_hourly.fit_profiles(
+            forecast_hourly.profile_stats(pd.DataFrame(rows, columns=["timestamp", "service", "cost"])), SERVICES)
+
+        epochs = live.values.astype("datetime64[s]").astype(np.int64)
+        per_service = np.array([[9 * cost(t)] * 4 for t in live])
+        future, yhat, _, _ = forecast_hourly.forecast_from_profiles(profiles, SERVICES, epochs, _window(per_service), 60)
+
+        hours = (future // 3600) % 24
+        np.testing.assert_allclose(yhat[hours == 11], 108.0, rtol=1e-6)
+        np.testing.assert_allclose(yhat[hours == 12], 72.0, rtol=1e-6)
+
+
+class RetentionTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        ts = pd.date_range("2025-01-01", periods=24 * 10, freq="h")
+        rows = [(t.strftime("%Y-%m-%d %H:%M:%S"), svc, float(t.hour + i)) for t in ts for i, svc in enumerate(SERVICES)]
+        pd.DataFrame(rows, columns=["timestamp", "service", "cost"]).to_csv(self.dir / "billing_hourly.csv", index=False)
+        settings = override_settings(BILLING_DATA_DIR=self.dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_compaction_keeps_profile_stats_and_daily_totals(self):
+        before = forecast_hourly.load_profile_stats()
+        summary = retention.apply_retention(retention_days=3, archive=True)
+
+        self.assertEqual(summary["cutoff"], "2025-01-07")
+        self.assertEqual(summary["compacted"], 6 * 24 * 4)
+        self.assertEqual(len(retention.read_raw_hourly()), summary["kept"])
+        pd.testing.assert_frame_equal(forecast_hourly.load_profile_stats().sort_index(), before.sort_index(), check_dtype=False)
+        daily = retention.load_daily_tier()
+        self.assertAlmostEqual(daily["cost"].sum(), sum(h + i for h in range(24) for i in range(4)) * 6)
+        self.assertTrue((self.dir / "archive" / "billing_hourly_20250101_20250106.csv.gz").exists())
+
+        # nothing left to compact, and nothing is counted twice
+        self.assertEqual(retention.apply_retention(retention_days=3)["compacted"], 0)
+        pd.testing.assert_frame_equal(forecast_hourly.load_profile_stats().sort_index(), before.sort_index(), check_dtype=False)
+
+    def test_on_ingest_check_is_off_by_default_and_runs_in_the_background(self):
+        self.assertIsNone(retention.maybe_apply_retention())
+        with self.settings(HOURLY_RETENTION_CHECK_SECONDS=3600, HOURLY_RAW_RETENTION_DAYS=3, HOURLY_ARCHIVE_COLD_DATA=False):
+            retention._last_check = 0.0
+            thread = retention.maybe_apply_retention()
+            self.assertIsNone(retention.maybe_apply_retention())  # throttled
+            thread.join(10)  # while the temp data dir is still in place
+        self.assertEqual(str(retention.compacted_before().date()), "2025-01-07")
+        self.assertEqual(len(retention.read_raw_hourly()), 4 * 24 * 4)  # Jan 7..10
+
+
+class FastJsonTests(SimpleTestCase):
+    def test_numpy_payload_matches_plain_json(self):
+        costs = np.array([[1.5, 2.0], [3.25, 4.0]])
+        payload = {
+            "timestamps": np.array([1700000000, 1700003600], dtype=np.int64),
+            "costs": costs[:, -1],  # not contiguous: goes through the fallback encoder
+            "predicted": np.round(costs[:, 0], 2),
+            "n": np.int64(2),
+            "delta": False,
+        }
+        expected = {"timestamps": [1700000000, 1700003600], "costs": [2.0, 4.0], "predicted": [1.5, 3.25], "n": 2, "delta": False}
+        self.assertEqual(json.loads(fastjson.dumps_bytes(payload)), expected)
+        response = fastjson.json_response(payload)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(json.loads(response.content), expected)
+
+
+class BudgetTests(TestCase):
+    def setUp(self):
+        # bulk_create skips the post_save signal, so the profile is created here
+        User.objects.bulk_create([User(username="ana", email="ana@example.com")])
+        self.user = User.objects.get(username="ana")
+        Profile.objects.create(user=self.user, extra_emails="ops@example.com")
+        self.monthly = Budget.objects.create(user=self.user, period="monthly", amount=100.0)
+
+    def spend(self, timestamp, cost, service="EC2"):
+        budgets.record_spend({"timestamp": timestamp, "service": service, "cost": cost})
+        self.monthly.refresh_from_db()
+
+    def test_forecast_then_breach_send_one_email_each(self):
+        self.spend("2025-03-02 00:00:00", 50)  # 3% into the month: too early to extrapolate
+        self.assertEqual(self.monthly.alert_level, "")
+        self.spend("2025-03-05 00:00:00", 1)  # 51 after 4 of 31 days -> ~395 projected
+        self.assertEqual(self.monthly.alert_level, "forecast")
+        self.spend("2025-03-06 00:00:00", 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("forecast to be exceeded", mail.outbox[0].subject)
+        self.assertEqual(mail.outbox[0].to, ["ana@example.com", "ops@example.com"])
+
+        self.spend("2025-03-07 00:00:00", 60)
+        self.assertEqual(self.monthly.alert_level, "breach")
+        self.spend("2025-03-08 00:00:00", 1)
+        self.assertEqual(self.monthly.spent, 113.0)
+        self.assertEqual([m.subject.split(":")[0] for m in mail.outbox],
+                         ["[CloudPulse AI] Budget forecast to be exceeded", "[CloudPulse AI] Budget exceeded"])
+
+    def test_new_period_resets_spend_and_alerts_and_late_rows_are_ignored(self):
+        self.spend("2025-03-20 00:00:00", 150)
+        self.assertEqual(self.monthly.alert_level, "breach")
+        self.spend("2025-04-01 01:00:00", 5)
+        self.assertEqual((self.monthly.spent, self.monthly.alert_level), (5.0, ""))
+        self.assertEqual(self.monthly.period_start.date().isoformat(), "2025-04-01")
+        self.spend("2025-03-31 23:00:00", 7)  # belongs to the closed march period
+        self.assertEqual(self.monthly.spent, 5.0)
+
+        self.spend("2025-04-20 00:00:00", 100)  # a breach in the new period alerts again
+        self.assertEqual(self.monthly.alert_level, "breach")
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_service_budgets_only_count_their_service(self):
+        s3 = Budget.objects.create(user=self.user, service="S3", period="daily", amount=10.0)
+        self.spend("2025-03-02 10:00:00", 4, service="EC2")
+        self.spend("2025-03-02 11:00:00", 3, service="S3")
+        s3.refresh_from_db()
+        self.assertEqual((s3.spent, self.monthly.spent), (3.0, 7.0))
+        self.spend("2025-03-03 00:30:00", 2, service="S3")  # next day: the daily budget rolls over
+        s3.refresh_from_db()
+        self.assertEqual(s3.spent, 2.0)
+
+    def test_opening_a_budget_alerts_on_spend_already_recorded(self):
+        data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, data_dir, ignore_errors=True)
+        storage.append_rows(data_dir / "billing_hourly.csv", [
+            {"timestamp": "2025-03-02 10:00:00", "service": "EC2", "cost": 40.0},
+            {"timestamp": "2025-03-02 11:00:00", "service": "S3", "cost": 29.99},
+        ])
+        when = timezone.make_aware(datetime(2025, 3, 2, 12))
+        with override_settings(BILLING_DATA_DIR=data_dir):
+            daily = budgets.open_budget(Budget(user=self.user, period="daily", amount=50.0), when)
+            ec2 = budgets.open_budget(Budget(user=self.user, service="EC2", period="daily", amount=70.0), when)
+
+        self.assertEqual((daily.spent, daily.alert_level), (69.99, "breach"))
+        self.assertEqual((ec2.spent, ec2.alert_level), (40.0, "forecast"))  # 40 by noon: 80 projected
+        self.assertEqual([m.subject.split(":")[0] for m in mail.outbox],
+                         ["[CloudPulse AI] Budget exceeded", "[CloudPulse AI] Budget forecast to be exceeded"])
+
+
+class ConcurrentSpendTests(TransactionTestCase):
+    def setUp(self):
+        User.objects.bulk_create([User(username="ana", email="ana@example.com")])
+        self.user = User.objects.get(username="ana")
+        Profile.objects.create(user=self.user)
+        Budget.objects.create(user=self.user, period="daily", amount=50.0)
+        Budget.objects.create(user=self.user, service="EC2", period="monthly", amount=1000.0)
+
+    def test_parallel_ingests_count_every_row(self):
+        errors = []
+
+        def ingest(worker):
+            try:
+                for i in range(10):
+                    budgets.record_spend({"timestamp": f"2025-03-02 10:{worker:02d}:{i:02d}", "service": "EC2", "cost": 1.5})
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=ingest, args=(w,)) for w in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(Budget.objects.values_list("spent", flat=True)), [120.0, 120.0])
+        self.assertEqual(Budget.objects.get(period="daily").alert_level, "breach")
+        self.assertEqual([m.subject.split(":")[0] for m in mail.outbox],
+                         ["[CloudPulse AI] Budget forecast to be exceeded", "[CloudPulse AI] Budget exceeded"])
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        settings = override_settings(BILLING_DATA_DIR=self.dir, LIVE_BUFFER_SHM_NAME=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        previous, live_buffer._buffer = live_buffer._buffer, None
+        self.addCleanup(setattr, live_buffer, "_buffer", previous)
+        cache.clear()
+
+        earlier = (datetime.now() - timedelta(hours=1)).strftime(retention.TIMESTAMP_FORMAT)
+        storage.append_rows(self.dir / "billing_hourly.csv", [{"timestamp": earlier, "service": "EC2", "cost": 10.0}])
+        storage.append_rows(self.dir / "billing_daily.csv", [{"date": f"2025-03-{d:02d}", "total_cost": 40.0} for d in range(1, 31)])
+
+        # the long-term forecast is the expensive piece: count how often it runs
+        self.forecasts = 0
+
+        def forecast():
+            self.forecasts += 1
+            return pd.DataFrame({"yhat": np.full(30, 50.0)})
+
+        patcher = mock.patch.object(views, "train_and_forecast", forecast)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        User.objects.bulk_create([User(username="ana"), User(username="ben")])
+        self.ana, self.ben = User.objects.get(username="ana"), User.objects.get(username="ben")
+        Profile.objects.bulk_create([Profile(user=self.ana), Profile(user=self.ben)])
+
+    def get(self, user):
+        self.client.force_login(user)
+        response = self.client.get("/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        return dict(part.split("=") for part in response["X-Dashboard-Cache"].split(","))
+
+    def test_pieces_are_cached_per_user(self):
+        self.assertEqual(set(self.get(self.ana).values()), {"miss"})
+        self.assertEqual(set(self.get(self.ana).values()), {"hit"})
+        self.assertEqual(set(self.get(self.ben).values()), {"miss"})
+        self.assertEqual(self.forecasts, 2)
+        self.assertEqual(cache_stats()["summary"], {"hit": 1, "miss": 2})
+
+    def test_hourly_ingest_keeps_the_daily_forecast_cached(self):
+        self.get(self.ana)
+        views.append_one_live_hour()
+        self.assertEqual(self.get(self.ana), {"chart": "miss", "anomalies": "miss", "recs": "hit", "summary": "hit"})
+        self.assertEqual(self.forecasts, 1)
+
+    def test_daily_append_invalidates_the_summary(self):
+        self.get(self.ana)
+        storage.append_rows(self.dir / "billing_daily.csv", [{"date": "2025-03-31", "total_cost": 40.0}])
+        self.assertEqual(self.get(self.ana), {"chart": "hit", "anomalies": "hit", "recs": "hit", "summary": "miss"})
+        self.assertEqual(self.forecasts, 2)
+        stats = cache_stats()
+        self.assertEqual((stats["chart"], stats["forecast"]), ({"hit": 1, "miss": 1}, {"hit": 0, "miss": 2}))
+
+
+class BacktestingTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        settings = override_settings(BILLING_DATA_DIR=self.dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for name, value in (("FOLD_CACHE_DIR", self.dir / "folds"), ("REPORT_PATH", self.dir / "latest.json")):
+            patcher = mock.patch.object(backtesting, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.daily = self.dir / "billing_daily.csv"
+        storage.append_rows(self.daily, [{"date": str(d.date()), "total_cost": 40.0 + d.dayofweek}
+                                         for d in pd.date_range("2025-01-01", periods=90)])
+
+    def test_fold_origins_stop_at_min_train_and_max_folds(self):
+        self.assertEqual(backtesting._fold_origins(100, 45, 30, 3, 8), list(range(49, 71, 3)))
+        self.assertEqual(backtesting._fold_origins(100, 45, 30, 3, 100), list(range(46, 71, 3)))
+        self.assertEqual(backtesting._fold_origins(75, 45, 30, 3, 8), [45])
+        self.assertEqual(backtesting._fold_origins(74, 45, 30, 3, 8), [])
+
+    def test_fold_key_only_depends_on_the_rows_the_fold_sees(self):
+        df = load_daily_series()
+        key = backtesting._fold_key("rolling_mean", "daily", df, 45, 30)
+        storage.append_rows(self.daily, [{"date": "2025-04-01", "total_cost": 99.0}])
+        self.assertEqual(backtesting._fold_key("rolling_mean", "daily", load_daily_series(), 45, 30), key)
+
+        df.loc[74, "y"] += 1  # the last row of the fold's test window
+        self.assertNotEqual(backtesting._fold_key("rolling_mean", "daily", df, 45, 30), key)
+
+    def test_second_run_reuses_every_cached_fold(self):
+        models = ["rolling_mean", "seasonal_naive"]
+        first = backtesting.run_backtest("daily", models=models, workers=1)
+        self.assertTrue(first["models"]["rolling_mean"]["available"])
+
+        def unexpected_fit(train, test_ds, season):
+            raise AssertionError("fold was refitted")
+
+        with mock.patch.dict(backtesting.MODELS, {name: unexpected_fit for name in models}):
+            second = backtesting.run_backtest("daily", models=models, workers=1)
+        self.assertEqual(second, first)
+
+    def test_score_pools_folds_per_horizon(self):
+        folds = [{"pred": [1.0, 2.0], "actual": [2.0, 2.0]}, {"pred": [3.0, 3.0], "actual": [1.0, 3.0]}]
+        self.assertEqual(backtesting._score(folds, [1, 2]), {
+            "1": {"mae": 1.5, "mape": 125.0, "folds": 2},
+            "2": {"mae": 0.75, "mape": 62.5, "folds": 2},
+        })
+        zero = backtesting._score([{"pred": [1.0, 2.0], "actual": [0.0, 0.0]}], [2])
+        self.assertEqual(zero["2"], {"mae": 1.5, "mape": None, "folds": 1})
+
+    def test_latest_accuracy_falls_back_to_rolling_mean(self):
+        self.assertIsNone(backtesting.load_latest_accuracy("daily", horizon=30))
+        metrics = {"mae": 2.5, "mape": 5.0, "folds": 8}
+        backtesting.REPORT_PATH.write_text(json.dumps({"generated_at": "2025-04-01 00:00:00", "daily": {"models": {
+            "prophet": {"available": False, "horizons": {}},
+            "rolling_mean": {"available": True, "horizons": {"30": metrics}},
+        }}}))
+        self.assertEqual(backtesting.load_latest_accuracy("daily", horizon=30),
+                         {"model": "rolling_mean", "horizon": 30, "generated_at": "2025-04-01 00:00:00", **metrics})
@@ -8,11 +8,13 @@ urlpatterns = [
     path("", views.index, name="index"),
     path("dashboard/", views.dashboard, name="dashboard"),
     path("live-update/", views.live_update, name="live_update"),
+    path("breakdown/", views.breakdown, name="breakdown"),
     path("force-anomaly/", views.force_anomaly, name="force_anomaly"),
     path("solve-anomaly/", views.solve_anomaly, name="solve_anomaly"),
     path("anomalies/", views.anomalies_list, name="anomalies_list"),
     path("recommendations/", views.recommendations_list, name="recommendations_list"),
     path("profile/", views.profile_page, name="profile"),
+    path("budgets/", views.budgets_page, name="budgets"),
     path("login/", views.login_user, name="login"),
     path("logout/", views.logout_user, name="logout"),
     path("register/", views.register_user, name="register"),
@@ -1,7 +1,5 @@
 # advisor/views.py
-import json
 import random
-import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
 
@@ -23,7 +21,16 @@ except Exception as e:
 
 from .anomaly_detector import detect_hourly_anomalies
 from .recommendations import get_recommendations
-from .models import Profile
+from . import live_buffer
+from . import forecast_hourly
+from .backtesting import load_latest_accuracy
+from . import cost_breakdown
+from . import storage
+from . import fastjson
+from . import dashboard_cache
+from . import budgets
+from . import retention
+from .models import Budget, Profile
 from django.contrib.auth.models import User
 
 # helper read/write extra emails (simple file-based fallback removed: use Profile)
@@ -44,13 +51,7 @@ def write_extra_emails(username, emails_list):
 
 # Append a simulated hour row to billing_hourly.csv
 def append_one_live_hour(force=False):
-    csv_path = ADVISOR_DIR / "billing_hourly.csv"
-    if not csv_path.exists():
-        # create an initial file with some synthetic data
-        df = pd.DataFrame(columns=["timestamp", "service", "cost"])
-        df.to_csv(csv_path, index=False)
-
-    df = pd.read_csv(csv_path)
+    csv_path = storage.data_path("billing_hourly.csv")
     now = datetime.now()
     svc = random.choice(["EC2", "S3", "RDS", "CloudFront"])
     baseline = round(random.uniform(8.0, 25.0), 2)
@@ -63,8 +64,19 @@ def append_one_live_hour(force=False):
         cost = round(max(0.1, baseline + noise), 2)
 
     new_row = {"timestamp": now.strftime("%Y-%m-%d %H:%M:%S"), "service": svc, "cost": cost}
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df.to_csv(csv_path, index=False)
+    # seed the live buffer before the row exists: the push below is what adds it
+    live_buffer.get_live_buffer()
+    # atomic append: concurrent readers see the file either before or after this row
+    storage.append_rows(csv_path, [new_row], columns=["timestamp", "service", "cost"],
+                        on_written=lambda: live_buffer.record_hour(new_row))
+    # opt-in: compacts hourly history past the retention window in the background
+    retention.maybe_apply_retention()
+    cost_breakdown.record_ingest()
+    try:
+        budgets.record_spend(new_row)
+    except Exception as e:
+        # the row is already in the CSV: a budget update must not turn the ingest into a 500
+        print("Budget update failed:", e)
     return new_row
 
 @login_required
@@ -73,25 +85,18 @@ def live_update(request):
     force_flag = request.GET.get("force", "0") == "1"
     new_row = append_one_live_hour(force=force_flag)
 
-    hourly_path = ADVISOR_DIR / "billing_hourly.csv"
-    df_hourly = pd.read_csv(hourly_path)
-    df_hourly["timestamp"] = pd.to_datetime(df_hourly["timestamp"], errors="coerce")
-    df_total = df_hourly.groupby("timestamp", as_index=False)["cost"].sum().sort_values("timestamp")
-    last_points = df_total.tail(72)
-
-    hourly_chart = [{"timestamp": t.strftime("%Y-%m-%d %H:%M"), "cost": float(c)} for t, c in zip(last_points["timestamp"], last_points["cost"])]
-
-    # simple short-term "prediction": linear extrapolation from last 6 points
-    future = []
-    if len(last_points) >= 6:
-        window = last_points.tail(6).reset_index(drop=True)
-        x = list(range(len(window)))
-        coef = (window["cost"].iloc[-1] - window["cost"].iloc[0]) / max(1, (x[-1] - x[0]))
-        last_ts = pd.to_datetime(window["timestamp"].iloc[-1])
-        for i in range(1, 13):  # next 12 hours (demo)
-            ts = (last_ts + pd.Timedelta(hours=i)).strftime("%Y-%m-%d %H:%M")
-            pred_val = float(max(0.1, window["cost"].iloc[-1] + coef * i))
-            future.append({"timestamp": ts, "predicted": round(pred_val, 2)})
+    # chart comes from the in-memory 72h window as parallel epoch/cost arrays;
+    # ?since=<epoch> (the client's newest point) returns only what changed from there on
+    try:
+        since = int(request.GET["since"])
+    except (KeyError, ValueError):
+        since = None
+    hourly_chart = live_buffer.hourly_chart_columns(since=since)
+
+    # the next 12 hours (with an 80% band) are sliced from the cached hourly forecast
+    future = forecast_hourly.next_hours(12)
+    if not len(future["timestamps"]):
+        future = live_buffer.short_term_forecast(hours=12, window=6)
 
     anomalies_all = detect_hourly_anomalies()
     # pick anomalies that match last appended timestamp (minute resolution)
@@ -122,30 +127,25 @@ def live_update(request):
     top_anoms = sorted(anomalies_all, key=lambda x: x.get("timestamp", ""), reverse=True)[:3]
 
     # top recs
-    recs = get_recommendations()
-    top_recs = sorted(recs, key=lambda x: x.get("savings_value", 0), reverse=True)[:3]
+    top_recs, _ = dashboard_cache.get_or_compute("recs", request.user.pk, _top_recs)
 
     # summary numbers (from daily if exists)
-    daily_path = ADVISOR_DIR / "billing_daily.csv"
+    daily_path = storage.data_path("billing_daily.csv")
     if daily_path.exists():
-        df_daily = pd.read_csv(daily_path)
+        df_daily = storage.read_csv(daily_path)
         total_cost = round(df_daily.tail(30)["total_cost"].sum(), 2) if not df_daily.empty else 0.0
     else:
-        total_cost = round(df_total.tail(30)["cost"].sum(), 2) if not df_total.empty else 0.0
+        total_cost = live_buffer.recent_total(30)
 
-    # long-term forecast (if function exists)
-    next_month_pred = 0.0
-    if train_and_forecast:
-        try:
-            fdf = train_and_forecast()
-            next_month_pred = round(float(fdf.tail(30)["yhat"].sum()), 2)
-        except Exception:
-            next_month_pred = 0.0
+    # long-term forecast (cached until billing_daily.csv changes)
+    next_month_pred, _ = dashboard_cache.get_or_compute("forecast", request.user.pk, _next_month_forecast)
 
     savings = round(next_month_pred - total_cost, 2)
 
-    return JsonResponse({
+    return fastjson.json_response({
         "hourly": hourly_chart,
+        "delta": since is not None,
+        "window": live_buffer.WINDOW_HOURS,
         "future": future,
         "new_anomalies": new_anoms,
         "top_anomalies": top_anoms,
@@ -154,48 +154,77 @@ def live_update(request):
     })
 
 
-@login_required
-def dashboard(request):
-    hourly_path = ADVISOR_DIR / "billing_hourly.csv"
-    if hourly_path.exists():
-        df_hourly = pd.read_csv(hourly_path)
-        df_hourly["timestamp"] = pd.to_datetime(df_hourly["timestamp"], errors="coerce")
-        df_total = df_hourly.groupby("timestamp", as_index=False)["cost"].sum().sort_values("timestamp")
-        last_points = df_total.tail(72)
-        hourly_chart = [{"timestamp": t.strftime("%Y-%m-%d %H:%M"), "cost": float(c)} for t, c in zip(last_points["timestamp"], last_points["cost"])]
-    else:
-        hourly_chart = []
-
+def _top_anomalies():
     anomalies = detect_hourly_anomalies()
-    top_anomalies = sorted(anomalies, key=lambda x: x.get("timestamp", ""), reverse=True)[:3]
+    return sorted(anomalies, key=lambda x: x.get("timestamp", ""), reverse=True)[:3]
+
+
+def _top_recs():
     recs = get_recommendations()
-    top_recs = sorted(recs, key=lambda x: x.get("savings_value", 0), reverse=True)[:3]
+    return sorted(recs, key=lambda x: x.get("savings_value", 0), reverse=True)[:3]
 
-    # summary (attempt train_and_forecast)
-    next_month_pred = 0.0
+
+def _next_month_forecast():
+    # long-term forecast (if function exists)
     if train_and_forecast:
         try:
             fdf = train_and_forecast()
-            next_month_pred = round(float(fdf.tail(30)["yhat"].sum()), 2)
+            return round(float(fdf.tail(30)["yhat"].sum()), 2)
         except Exception:
-            next_month_pred = 0.0
+            pass
+    return 0.0
 
-    daily_path = ADVISOR_DIR / "billing_daily.csv"
+
+def _dashboard_summary(user_id):
+    next_month_pred, _ = dashboard_cache.get_or_compute("forecast", user_id, _next_month_forecast)
+
+    daily_path = storage.data_path("billing_daily.csv")
     if daily_path.exists():
-        df_daily = pd.read_csv(daily_path)
+        df_daily = storage.read_csv(daily_path)
         total_cost = round(df_daily.tail(30)["total_cost"].sum(), 2) if not df_daily.empty else 0.0
     else:
         total_cost = 0.0
 
-    summary = {"total_cost": total_cost, "change_percentage": 0.0, "predicted_next_month": next_month_pred, "savings": round(next_month_pred - total_cost, 2)}
+    return {"total_cost": total_cost, "change_percentage": 0.0, "predicted_next_month": next_month_pred, "savings": round(next_month_pred - total_cost, 2)}
+
+
+@login_required
+def dashboard(request):
+    # each piece is cached per user and data version; an ingest only invalidates what it touched
+    uid = request.user.pk
+    chart_json, chart_state = dashboard_cache.get_or_compute("chart", uid, lambda: fastjson.dumps(live_buffer.hourly_chart_columns()))
+    top_anomalies, anom_state = dashboard_cache.get_or_compute("anomalies", uid, _top_anomalies)
+    top_recs, recs_state = dashboard_cache.get_or_compute("recs", uid, _top_recs)
+    summary, summary_state = dashboard_cache.get_or_compute("summary", uid, lambda: _dashboard_summary(uid))
+
+    # accuracy from the last `manage.py backtest_forecasts` run (None until it has run once)
+    summary = dict(summary, forecast_accuracy=load_latest_accuracy("daily", horizon=30))
 
     context = {
         "summary": summary,
-        "hourly_chart_json": json.dumps(hourly_chart),
+        "hourly_chart_json": chart_json,
         "top_anomalies": top_anomalies,
         "top_recs": top_recs,
     }
-    return render(request, "advisor/dashboard.html", context)
+    response = render(request, "advisor/dashboard.html", context)
+    response["X-Dashboard-Cache"] = f"chart={chart_state},anomalies={anom_state},recs={recs_state},summary={summary_state}"
+    return response
+
+
+@login_required
+def breakdown(request):
+    # cost by service/category and period, e.g. /breakdown/?dimension=category&period=week&start=2024-01-01
+    try:
+        data = cost_breakdown.get_breakdown(
+            request.user.pk,
+            start=request.GET.get("start") or None,
+            end=request.GET.get("end") or None,
+            dimension=request.GET.get("dimension", "service"),
+            period=request.GET.get("period", "total"),
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(data)
 
 
 @login_required
@@ -239,6 +268,34 @@ def profile_page(request):
     return render(request, "advisor/profile.html", {"extras": extras})
 
 
+@login_required
+def budgets_page(request):
+    user = request.user
+    if request.method == "POST":
+        if request.POST.get("delete"):
+            Budget.objects.filter(user=user, pk=request.POST.get("delete")).delete()
+            return redirect("advisor:budgets")
+        try:
+            amount = float(request.POST.get("amount", ""))
+        except ValueError:
+            amount = 0.0
+        period = request.POST.get("period", "monthly")
+        if amount <= 0 or period not in dict(Budget.PERIOD_CHOICES):
+            return render(request, "advisor/budgets.html", {
+                "budgets": user.budgets.order_by("service", "period"),
+                "services": live_buffer.SERVICES,
+                "error": "Enter a positive amount and a valid period",
+            })
+        budget = Budget(user=user, service=request.POST.get("service", "").strip(), period=period, amount=amount)
+        budgets.open_budget(budget)
+        return redirect("advisor:budgets")
+
+    return render(request, "advisor/budgets.html", {
+        "budgets": user.budgets.order_by("service", "period"),
+        "services": live_buffer.SERVICES,
+    })
+
+
 def index(request):
     return render(request, "advisor/index.html")
 
@@ -65,6 +65,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # take the write lock at BEGIN: a read-then-write transaction (budgets.record_spend)
+        # then waits for a concurrent ingest instead of failing with "database is locked"
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        # a file, not the shared in-memory default, so tests see the same locking as production
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -142,3 +147,34 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
 
+
+# Directory with the billing CSVs (billing_hourly/daily/detailed.csv and the retention tiers)
+BILLING_DATA_DIR = BASE_DIR / "advisor"
+
+# Live 72h window kept in a shared memory block so every worker sees the same data.
+# Set to None to keep a per-process buffer instead.
+LIVE_BUFFER_SHM_NAME = "cloudpulse_live"
+
+# Dashboard context pieces are cached per user and data version (advisor/dashboard_cache.py).
+# Local memory is per worker; use django.core.cache.backends.filebased.FileBasedCache
+# with a shared LOCATION to share entries and hit/miss counters between workers.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "cloudpulse",
+    }
+}
+DASHBOARD_CACHE_TIMEOUT = 3600
+
+# How often the hourly profile forecast behind the live chart is refitted (seconds)
+HOURLY_FORECAST_REFIT_SECONDS = 900
+
+# Retention of billing_hourly.csv (advisor/retention.py): raw rows are kept for this many
+# days back from the newest row; older ones are compacted into daily / profile tiers and,
+# if enabled, archived to archive/*.csv.gz. Run it with `manage.py compact_history`
+# (e.g. from a nightly cron job). Compacted rows no longer show up in the anomaly list or
+# the hourly backtest. Setting HOURLY_RETENTION_CHECK_SECONDS also starts it in the
+# background on ingestion, at most that often per process; None keeps it off.
+HOURLY_RAW_RETENTION_DAYS = 90
+HOURLY_ARCHIVE_COLD_DATA = True
+HOURLY_RETENTION_CHECK_SECONDS = None